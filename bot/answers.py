@@ -0,0 +1,146 @@
+import asyncio
+import difflib
+import os
+import re
+
+from cache import MISSING, TTLCache
+
+FALLBACK_ANSWER = "Не удалось получить ответ. Попробуйте позже или напишите в поддержку командой /support."
+
+# Готовые ответы на частые вопросы: формулировки вопроса -> ответ.
+# Ответ выдаётся только на почти дословный вопрос, всё остальное уходит модели
+FAQ_ANSWERS = [
+    (("как проверить бонусы", "как проверить баланс бонусов", "сколько у меня бонусов",
+      "как начисляются бонусы", "как пополнить бонусы"),
+     "Бонусы начисляются из расчёта 2,5 литра на каждого проживающего. "
+     "Проверить баланс можно кнопкой «Проверить бонусы», пополнить — «Пополнить бонусы»."),
+    (("как получить qr код", "где взять qr код", "как получить бонус", "сколько действует qr код"),
+     "QR‑код выдаётся кнопкой «Получить бонус (QR‑код)», когда у вас есть активный заказ. "
+     "Код действует 1 час; покажите его курьеру при получении воды."),
+    (("как сделать заказ", "как заказать воду", "кто доставит заказ", "как назначается курьер"),
+     "Сделать заказ можно кнопкой «Сделать заказ» или командой /order. "
+     "Заказ получает ближайший к вашему адресу курьер, у которого есть место для заказа; "
+     "если рядом такого нет или координаты адреса неизвестны — наименее загруженный курьер вашего района."),
+]
+
+# Минимальная похожесть на формулировку из FAQ (difflib), ниже — вопрос для модели
+FAQ_MIN_RATIO = 0.9
+
+_WORD = re.compile(r"[\w]+", re.UNICODE)
+
+_FAQ_BY_QUESTION = {
+    question: answer
+    for questions, answer in FAQ_ANSWERS
+    for question in questions
+}
+
+
+def normalize_question(question):
+    return " ".join(_WORD.findall(question.lower()))
+
+
+def find_faq_answer(normalized):
+    answer = _FAQ_BY_QUESTION.get(normalized)
+    if answer is not None:
+        return answer
+    matcher = difflib.SequenceMatcher(b=normalized, autojunk=False)
+    for question, answer in _FAQ_BY_QUESTION.items():
+        matcher.set_seq1(question)
+        if matcher.real_quick_ratio() >= FAQ_MIN_RATIO and matcher.quick_ratio() >= FAQ_MIN_RATIO \
+                and matcher.ratio() >= FAQ_MIN_RATIO:
+            return answer
+    return None
+
+
+class OpenAIBackend:
+    def __init__(self, model="gpt-3.5-turbo", max_tokens=150):
+        import openai
+
+        self.model = model
+        self.max_tokens = max_tokens
+        api_key = os.getenv("OPENAI_API_KEY")
+        if hasattr(openai, "AsyncOpenAI"):
+            self._client = openai.AsyncOpenAI(api_key=api_key)
+        else:
+            openai.api_key = api_key
+            self._client = None
+            self._openai = openai
+
+    async def complete(self, question):
+        messages = [{"role": "user", "content": question}]
+        if self._client is not None:
+            response = await self._client.chat.completions.create(
+                model=self.model, messages=messages, max_tokens=self.max_tokens
+            )
+        else:
+            response = await self._openai.ChatCompletion.acreate(
+                model=self.model, messages=messages, max_tokens=self.max_tokens
+            )
+        return response.choices[0].message.content.strip()
+
+
+class StubBackend:
+    """Локальный ответчик без сети — для нагрузочных тестов"""
+
+    def __init__(self, delay=None):
+        self.delay = delay if delay is not None else float(os.getenv("ANSWER_STUB_DELAY", "0.2"))
+
+    async def complete(self, question):
+        await asyncio.sleep(self.delay)
+        return f"Тестовый ответ на вопрос: {question[:100]}"
+
+
+class AnswerService:
+    """
+    Ответы на вопросы /help: сначала готовые ответы на почти дословные частые вопросы, затем кэш
+    по нормализованному вопросу, затем модель — с ограничением параллельных
+    вызовов и таймаутом. Одинаковые одновременные вопросы делят один вызов.
+    """
+
+    def __init__(self, backend, concurrency=None, timeout=None, cache_ttl=None, cache_size=1000):
+        self.backend = backend
+        self.timeout = timeout or float(os.getenv("ANSWER_TIMEOUT", "10"))
+        self._semaphore = asyncio.Semaphore(concurrency or int(os.getenv("ANSWER_CONCURRENCY", "4")))
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl or float(os.getenv("ANSWER_CACHE_TTL", "3600")))
+        self._in_flight = {}
+        self.stats = {"faq": 0, "backend": 0, "timeouts": 0, "errors": 0}
+
+    async def answer(self, question):
+        normalized = normalize_question(question)
+        faq = find_faq_answer(normalized)
+        if faq is not None:
+            self.stats["faq"] += 1
+            return faq
+        cached = self.cache.get(normalized)
+        if cached is not MISSING:
+            return cached
+        future = self._in_flight.get(normalized)
+        if future is None:
+            future = asyncio.ensure_future(self._ask(normalized, question))
+            self._in_flight[normalized] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(normalized, None))
+        return await asyncio.shield(future)
+
+    async def _ask(self, normalized, question):
+        try:
+            async with self._semaphore:
+                self.stats["backend"] += 1
+                text = await asyncio.wait_for(self.backend.complete(question), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return FALLBACK_ANSWER
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Ошибка получения ответа: {e}")
+            return FALLBACK_ANSWER
+        self.cache.set(normalized, text)
+        return text
+
+
+def create_answer_service():
+    # ANSWER_BACKEND=stub — ответы без обращения к OpenAI
+    if os.getenv("ANSWER_BACKEND", "openai") == "stub":
+        backend = StubBackend()
+    else:
+        backend = OpenAIBackend()
+    return AnswerService(backend)
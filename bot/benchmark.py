@@ -0,0 +1,391 @@
+"""
+Бенчмарки слоя данных.
+
+    BENCH_DATABASE_URL=postgresql://localhost/water_bench python bot/benchmark.py db --scales 10000 100000 1000000
+    python bot/benchmark.py handlers --clients 2000
+    python bot/benchmark.py dispatch --couriers 1000 10000
+
+db       — каждый метод Database на наполненной базе заданного размера (клиентов):
+           операций в секунду, p50/p99 и число обращений к базе за вызов. Метод Database без бенчмарка
+           (и не из NOT_BENCHMARKED) останавливает запуск.
+           База BENCH_DATABASE_URL очищается перед каждым размером — только отдельная база!
+handlers — сценарии нагрузочного теста (loadtest.py) с InMemoryDatabase вместо Postgres:
+           стоимость обработчиков и PTB без базы.
+dispatch — подбор курьера CourierDispatcher.assign по координатам и по району
+           для заданного числа курьеров (--couriers), без базы.
+
+Результаты пишутся в JSON (--out) для сравнения до и после изменений слоя данных.
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ANSWER_BACKEND", "stub")
+# Режим handlers идёт через loadtest с поддельным Bot API — без общего лимита отправки
+os.environ.setdefault("SEND_GLOBAL_RATE", "100000")
+
+import asyncpg  # noqa: E402
+
+import main  # noqa: E402
+from dispatcher import CourierDispatcher  # noqa: E402
+from fakedb import InMemoryDatabase  # noqa: E402
+from orders import ORDER_ACCEPTED  # noqa: E402
+from qr_tokens import issue_token  # noqa: E402
+from repo.migrate import SEED_SQL, apply_migrations  # noqa: E402
+
+SEED_TABLES = ("users, bonuses, bonus_ledger, residents, couriers, orders, qr_codes, qr_revocations, "
+               "geocodes, bot_user_data, bot_conversations, broadcasts")
+COURIER_ID_BASE = 1_000_000  # как в SEED_SQL
+BULK_BATCH = 100  # записей в одном вызове bulk_upsert_*
+
+# Методы Database, которые не вызываются на обработке обновлений: запуск, остановка и подписки
+NOT_BENCHMARKED = {
+    "connect", "close", "run_migrations", "warm_up", "listen", "start_cache_invalidation", "try_listener_lock",
+}
+
+
+class CountingConnection:
+    """Обёртка соединения asyncpg, считающая обращения к базе (транзакция — BEGIN и COMMIT)"""
+
+    QUERY_METHODS = {"execute", "executemany", "fetch", "fetchrow", "fetchval",
+                     "copy_records_to_table", "copy_to_table", "prepare"}
+
+    def __init__(self, conn, stats):
+        self._conn = conn
+        self._stats = stats
+
+    def __getattr__(self, name):
+        attr = getattr(self._conn, name)
+        if name == "transaction":
+            self._stats["round_trips"] += 2
+        elif name in self.QUERY_METHODS:
+            self._stats["round_trips"] += 1
+        return attr
+
+
+def count_round_trips(db):
+    """Подменяет выдачу соединений у экземпляра Database; возвращает словарь-счётчик"""
+    stats = {"round_trips": 0}
+    get_connection, release_connection = db._get_connection, db._release_connection
+
+    async def counted_get():
+        return CountingConnection(await get_connection(), stats)
+
+    async def counted_release(conn):
+        await release_connection(conn._conn if isinstance(conn, CountingConnection) else conn)
+
+    db._get_connection, db._release_connection = counted_get, counted_release
+    return stats
+
+
+async def seed(db, rows):
+    conn = await db._get_connection()
+    try:
+        await apply_migrations(conn)
+        await conn.execute(f"TRUNCATE {SEED_TABLES} RESTART IDENTITY")
+        # $1 в SEED_SQL — число клиентов; asyncpg не принимает параметры в нескольких командах сразу
+        await conn.execute(SEED_SQL.replace("$1", str(int(rows))))
+        await conn.execute(f"ANALYZE {SEED_TABLES}")
+        open_orders = await conn.fetch(
+            "SELECT id, user_id, courier_id FROM orders WHERE status = 'assigned' ORDER BY random() LIMIT 20000"
+        )
+    finally:
+        await db._release_connection(conn)
+    return [tuple(r) for r in open_orders]
+
+
+def benchmarks(db, rows, open_orders):
+    """
+    (имя, фабрика вызова) — фабрика получает генератор случайных чисел и возвращает корутину.
+    Имя начинается с метода Database (несколько методов — через " + "), см. uncovered_methods()
+    """
+    couriers = max(rows // 10, 1)
+    user = lambda rng: rng.randint(1, rows)  # noqa: E731
+    courier = lambda rng: COURIER_ID_BASE + rng.randint(1, couriers)  # noqa: E731
+    district = lambda rng: f"district_{rng.randint(0, 49)}"  # noqa: E731
+    address = lambda rng: f"address {rng.randint(1, rows)}"  # noqa: E731
+    # Открытые заказы расходуются завершающими методами, поэтому делятся между ними
+    completable = open_orders[0::3]
+    redeemable = open_orders[1::3]
+    acceptable = open_orders[2::3]
+    # Новые клиенты и курьеры — за пределами id из SEED_SQL
+    new_users = itertools.count(rows + 1)
+    new_couriers = itertools.count(COURIER_ID_BASE + couriers + 1)
+
+    def get_user_uncached(rng):
+        user_id = user(rng)
+        db.profile_cache.invalidate(("user", user_id))
+        return db.get_user(user_id)
+
+    def get_courier_uncached(rng):
+        courier_id = courier(rng)
+        db.profile_cache.invalidate(("courier", courier_id))
+        return db.get_courier(courier_id)
+
+    def complete_order_by_user(rng):
+        _, user_id, courier_id = completable.pop() if completable else (0, user(rng), courier(rng))
+        return db.complete_order_by_user(user_id, courier_id)
+
+    def redeem_signed_qr(rng):
+        order_id, user_id, courier_id = redeemable.pop() if redeemable else (0, user(rng), courier(rng))
+        return db.redeem_qr(issue_token(order_id, user_id), courier_id)
+
+    def accept_order(rng):
+        order_id, _, courier_id = acceptable.pop() if acceptable else (0, user(rng), courier(rng))
+        return db.transition_order(order_id, ORDER_ACCEPTED, courier_id=courier_id)
+
+    async def orders_second_page(rng):
+        courier_id = courier(rng)
+        orders, _ = await db.get_orders_for_courier(courier_id)
+        if orders:
+            await db.get_orders_for_courier(courier_id, cursor_id=orders[-1]['id'])
+
+    async def save_and_load_user_data(rng):
+        user_id = user(rng)
+        await db.save_persistence([], [(user_id, json.dumps({"district": "district_1"}))])
+        await db.load_user_data(user_id)
+
+    def load_conversation_states(rng):
+        key = json.dumps([user(rng)] * 2)
+        return db.load_conversation_states(["client_registration", "residents"], [key, key])
+
+    async def broadcast_lifecycle(rng):
+        broadcast = await db.create_broadcast(district(rng), "benchmark", 0, 60)
+        await db.checkpoint_broadcast(broadcast['id'], user(rng), 10, 0, 60)
+        await db.finish_broadcast(broadcast['id'])
+        await db.get_broadcast(broadcast['id'])
+
+    async def district_recipients(rng):
+        # Одна рассылка по району: все получатели порциями
+        async for _ in db.iter_district_recipients(district(rng)):
+            pass
+
+    def bulk_clients(rng):
+        return db.bulk_upsert_clients(
+            [(user(rng), "iin", address(rng), "phone", district(rng)) for _ in range(BULK_BATCH)]
+        )
+
+    def bulk_residents(rng):
+        return db.bulk_upsert_residents([(user(rng), 2, 1, 0) for _ in range(BULK_BATCH)])
+
+    def bulk_couriers(rng):
+        return db.bulk_upsert_couriers([
+            ("courier", "iin", "phone", address(rng), "email", courier(rng), district(rng)) for _ in range(BULK_BATCH)
+        ])
+
+    def bulk_geocodes(rng):
+        return db.bulk_upsert_geocodes([
+            (f"address {i}", 43.2 + i * 0.00001, 76.9) for i in (rng.randint(1, rows) for _ in range(BULK_BATCH))
+        ])
+
+    return [
+        ("user_exists", lambda rng: db.user_exists(user(rng))),
+        ("add_user", lambda rng: db.add_user(next(new_users), "iin", address(rng), "phone", district(rng))),
+        ("update_user", lambda rng: db.update_user(user(rng), "iin", address(rng), "phone", district(rng))),
+        ("get_user (cached)", lambda rng: db.get_user(rng.randint(1, 100))),
+        ("get_user", get_user_uncached),
+        ("get_client_district", lambda rng: db.get_client_district(user(rng))),
+        ("set_location", lambda rng: db.set_location(user(rng), 43.2 + rng.random() / 10, 76.9)),
+        ("get_courier", get_courier_uncached),
+        ("create_couriers", lambda rng: db.create_couriers(
+            "courier", "iin", "phone", address(rng), "email", next(new_couriers), district(rng))),
+        ("get_bonus_balance", lambda rng: db.get_bonus_balance(user(rng))),
+        ("get_session_snapshot", lambda rng: db.get_session_snapshot(user(rng))),
+        ("add_bonus", lambda rng: db.add_bonus(user(rng), 2.5)),
+        ("deduct_bonus", lambda rng: db.deduct_bonus(user(rng), 1)),
+        ("deduct_all_bonus", lambda rng: db.deduct_all_bonus(user(rng))),
+        ("update_residents", lambda rng: db.update_residents(user(rng), 2, 1, 0)),
+        ("match_courier_by_district", lambda rng: db.match_courier_by_district(district(rng))),
+        ("get_courier_with_load", lambda rng: db.get_courier_with_load(courier(rng))),
+        ("get_couriers_with_load", lambda rng: db.get_couriers_with_load()),
+        ("create_order", lambda rng: db.create_order(user(rng), courier(rng), "benchmark order")),
+        ("get_active_order", lambda rng: db.get_active_order(user(rng))),
+        ("get_orders_for_courier", lambda rng: db.get_orders_for_courier(courier(rng))),
+        ("get_orders_for_courier (page 2)", orders_second_page),
+        ("get_route_stops", lambda rng: db.get_route_stops(courier(rng))),
+        ("transition_order (accept)", accept_order),
+        ("complete_order_by_user", complete_order_by_user),
+        ("generate_qr", lambda rng: db.generate_qr(user(rng), rng.randint(1, rows * 3))),
+        ("get_qr_record", lambda rng: db.get_qr_record(f"code_{user(rng)}")),
+        ("get_qr_by_order", lambda rng: db.get_qr_by_order(rng.randint(1, rows))),
+        ("redeem_qr (signed)", redeem_signed_qr),
+        ("redeem_qr (stored)", lambda rng: db.redeem_qr(f"code_{user(rng)}", courier(rng))),
+        ("save_persistence + load_user_data", save_and_load_user_data),
+        ("load_conversation_states", load_conversation_states),
+        ("create_broadcast + checkpoint_broadcast + finish_broadcast + get_broadcast", broadcast_lifecycle),
+        ("claim_stale_broadcasts", lambda rng: db.claim_stale_broadcasts(60)),
+        ("iter_district_recipients", district_recipients),
+        (f"bulk_upsert_clients ({BULK_BATCH})", bulk_clients),
+        (f"bulk_upsert_residents ({BULK_BATCH})", bulk_residents),
+        (f"bulk_upsert_couriers ({BULK_BATCH})", bulk_couriers),
+        (f"bulk_upsert_geocodes ({BULK_BATCH})", bulk_geocodes),
+        ("reconcile_bonuses", lambda rng: db.reconcile_bonuses()),
+    ]
+
+
+def database_methods():
+    """Публичные методы Database, обращающиеся к базе (корутины и асинхронные генераторы)"""
+    return {
+        name for name, method in inspect.getmembers(main.Database)
+        if not name.startswith("_")
+        and (inspect.iscoroutinefunction(method) or inspect.isasyncgenfunction(method))
+    }
+
+
+def uncovered_methods(entries):
+    """Методы Database, для которых нет ни одного бенчмарка и которые не перечислены в NOT_BENCHMARKED"""
+    covered = {method for name, _ in entries for method in name.split(" (")[0].split(" + ")}
+    return sorted(database_methods() - covered - NOT_BENCHMARKED)
+
+
+async def measure(call, rng, stats, duration, max_ops):
+    latencies = []
+    stats["round_trips"] = 0
+    started = time.perf_counter()
+    while len(latencies) < max_ops and time.perf_counter() - started < duration:
+        t0 = time.perf_counter()
+        await call(rng)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[int(0.50 * (len(latencies) - 1))] * 1000, 3),
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 3),
+        "round_trips_per_call": round(stats["round_trips"] / len(latencies), 2),
+    }
+
+
+async def run_db(args):
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        print("❌ BENCH_DATABASE_URL не задан: бенчмарк очищает таблицы и нужна отдельная база")
+        sys.exit(2)
+    uncovered = uncovered_methods(benchmarks(None, 1, []))
+    if uncovered:
+        print(f"❌ Методы Database без бенчмарка: {', '.join(uncovered)} (добавьте в benchmarks() или NOT_BENCHMARKED)")
+        sys.exit(2)
+    db = main.Database()
+    db.db_url = url
+    await db.connect()
+    stats = count_round_trips(db)
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        for rows in args.scales:
+            print(f"Наполнение базы: {rows} клиентов...")
+            open_orders = await seed(db, rows)
+            results[str(rows)] = {}
+            for name, call in benchmarks(db, rows, open_orders):
+                if args.only and not any(part in name for part in args.only):
+                    continue
+                try:
+                    result = await measure(call, rng, stats, args.duration, args.max_ops)
+                except asyncpg.PostgresError as e:
+                    result = {"error": str(e)}
+                results[str(rows)][name] = result
+                print(f"  {name:<36}{json.dumps(result, ensure_ascii=False)}")
+    finally:
+        await db.close()
+    return results
+
+
+async def run_handlers(args):
+    import loadtest
+
+    # Обработчики и диспетчер обращаются к main.db, поэтому подменяется сам объект
+    fake = InMemoryDatabase()
+    main.db = fake
+    main.dispatcher.db = fake
+    main.broadcaster.db = fake
+    main.order_notifier.db = fake
+    return await loadtest.run(loadtest.parse_args([
+        "--clients", str(args.clients), "--couriers", str(max(args.clients // 10, 1)), "--api-delay", "0",
+    ]))
+
+
+# Район поиска для режима dispatch: квадрат ~30×30 км
+CITY_CENTER = (43.24, 76.89)
+CITY_SPAN_DEG = 0.27
+
+
+async def run_dispatch(args):
+    rng = random.Random(args.seed)
+    results = {}
+    for couriers in args.couriers:
+        dispatcher = CourierDispatcher(InMemoryDatabase())
+        districts = [f"district_{i}" for i in range(50)]
+        for i in range(couriers):
+            dispatcher.add_courier({
+                'telegram_id': COURIER_ID_BASE + i, 'district': districts[i % len(districts)],
+                'lat': CITY_CENTER[0] + rng.uniform(-CITY_SPAN_DEG, CITY_SPAN_DEG) / 2,
+                'lon': CITY_CENTER[1] + rng.uniform(-CITY_SPAN_DEG, CITY_SPAN_DEG) / 2,
+            })
+        dispatcher.loaded = True
+
+        def point(rng):
+            return (CITY_CENTER[0] + rng.uniform(-CITY_SPAN_DEG, CITY_SPAN_DEG) / 2,
+                    CITY_CENTER[1] + rng.uniform(-CITY_SPAN_DEG, CITY_SPAN_DEG) / 2)
+
+        # Заказ сразу снимается с курьера, чтобы нагрузка не росла за время замера
+        async def assign_nearest(rng):
+            courier = await dispatcher.assign(rng.choice(districts), point(rng))
+            if courier:
+                dispatcher.release(courier['telegram_id'])
+
+        async def assign_district(rng):
+            courier = await dispatcher.assign(rng.choice(districts))
+            if courier:
+                dispatcher.release(courier['telegram_id'])
+
+        results[str(couriers)] = {}
+        for name, call in (("assign_nearest", assign_nearest), ("assign_district", assign_district)):
+            result = await measure(call, rng, {}, args.duration, args.max_ops)
+            results[str(couriers)][name] = result
+            print(f"  {couriers:>7} курьеров  {name:<20}{json.dumps(result, ensure_ascii=False)}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки слоя данных бота")
+    parser.add_argument("mode", choices=["db", "handlers", "dispatch"])
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="размеры базы (число клиентов)")
+    parser.add_argument("--duration", type=float, default=2.0, help="секунд на метод")
+    parser.add_argument("--max-ops", type=int, default=5000, help="не больше операций на метод")
+    parser.add_argument("--only", nargs="*", help="только методы, в имени которых есть подстрока")
+    parser.add_argument("--clients", type=int, default=2000, help="клиентов для режима handlers")
+    parser.add_argument("--couriers", type=int, nargs="+", default=[1000, 5000, 20000],
+                        help="число курьеров для режима dispatch")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="benchmark_results.json")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    runner = {"db": run_db, "handlers": run_handlers, "dispatch": run_dispatch}[args.mode]
+    results = asyncio.run(runner(args))
+    document = {
+        "mode": args.mode,
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2, default=str)
+    print(f"✅ Результаты сохранены в {args.out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+
+from sender import PRIORITY_BULK, PRIORITY_CLIENT
+
+
+class Broadcaster:
+    """
+    Рассылка сообщения всем клиентам района: получатели читаются из базы пачками
+    (Database.iter_district_recipients), каждая пачка отправляется через MessageSender
+    с низким приоритетом и дожидается доставки, после чего прогресс сохраняется.
+    В памяти одновременно не больше одной пачки, сколько бы клиентов ни было в районе.
+
+    После падения реплики рассылка продолжается с последней сохранённой пачки
+    (сообщения незавершённой пачки могут прийти повторно).
+    """
+
+    def __init__(self, db, sender, chunk_size=None, lease=None):
+        self.db = db
+        self.sender = sender
+        self.chunk_size = chunk_size or int(os.getenv("BROADCAST_CHUNK_SIZE", "500"))
+        self.lease = lease or float(os.getenv("BROADCAST_LEASE", "300"))
+        self._tasks = {}  # id рассылки -> задача
+        self._watch_task = None
+
+    async def start(self, district, text, created_by):
+        broadcast = await self.db.create_broadcast(district, text, created_by, self.lease)
+        self._spawn(broadcast)
+        return broadcast['id']
+
+    async def resume(self):
+        """Подхватывает рассылки, прерванные падением или рестартом"""
+        for broadcast in await self.db.claim_stale_broadcasts(self.lease):
+            if broadcast['id'] in self._tasks:
+                # Своя рассылка, не успевшая продлить аренду: уже идёт в этой реплике
+                continue
+            print(f"⚠️ Продолжение рассылки №{broadcast['id']} с клиента {broadcast['last_user_id']}")
+            self._spawn(broadcast)
+
+    def start_watch(self):
+        """Периодически подхватывает рассылки, брошенные упавшими репликами"""
+        async def watch():
+            while True:
+                try:
+                    await self.resume()
+                except Exception as e:
+                    print(f"❌ Ошибка проверки незавершённых рассылок: {e}")
+                await asyncio.sleep(self.lease)
+        self._watch_task = asyncio.ensure_future(watch())
+
+    def _spawn(self, broadcast):
+        task = asyncio.ensure_future(self._run(broadcast))
+        self._tasks[broadcast['id']] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast['id'], None))
+
+    async def stop(self):
+        # Прогресс уже сохранён по пачкам; после истечения аренды рассылку продолжит любая реплика
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _deliver(self, chat_id, text):
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+
+        def on_result(ok):
+            if not result.done():
+                result.set_result(ok)
+
+        self.sender.send(chat_id, text, priority=PRIORITY_BULK, on_result=on_result)
+        return result
+
+    async def _run(self, broadcast):
+        broadcast_id = broadcast['id']
+        try:
+            recipients = self.db.iter_district_recipients(
+                broadcast['district'], broadcast['last_user_id'], chunk_size=self.chunk_size
+            )
+            async for chunk in recipients:
+                results = await asyncio.gather(*(self._deliver(user_id, broadcast['text']) for user_id in chunk))
+                sent = sum(results)
+                status = await self.db.checkpoint_broadcast(
+                    broadcast_id, chunk[-1], sent, len(results) - sent, self.lease
+                )
+                if status != "running":
+                    await recipients.aclose()
+                    return
+            final = await self.db.finish_broadcast(broadcast_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Ошибка рассылки №{broadcast_id}: {e}")
+            final = await self.db.finish_broadcast(broadcast_id, "failed")
+        print(f"✅ Рассылка №{broadcast_id} завершена: доставлено {final['sent']}, ошибок {final['failed']}")
+        if final['created_by']:
+            self.sender.send(final['created_by'], format_broadcast(final), priority=PRIORITY_CLIENT)
+
+
+def format_broadcast(broadcast):
+    statuses = {"running": "идёт", "done": "завершена", "failed": "прервана ошибкой", "cancelled": "отменена"}
+    return (f"Рассылка №{broadcast['id']} (район: {broadcast['district']}) — "
+            f"{statuses.get(broadcast['status'], broadcast['status'])}.\n"
+            f"Доставлено: {broadcast['sent']}, ошибок: {broadcast['failed']}.")
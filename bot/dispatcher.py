@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import json
+import math
+import os
+
+from orders import OPEN_STATUSES
+from geo import KM_PER_DEGREE, haversine_km
+
+
+def location_of(row):
+    """(lat, lon) клиента или курьера; None, если координат нет"""
+    if row is None or row.get('lat') is None or row.get('lon') is None:
+        return None
+    return row['lat'], row['lon']
+
+
+class _DistrictIndex:
+    """Курьеры одного района, сгруппированные по числу открытых заказов"""
+
+    def __init__(self):
+        self.load = {}       # courier_id -> число открытых заказов
+        self.buckets = {}    # число заказов -> {courier_id: None} (порядок вставки = очередь)
+        self.min_load = 0
+
+    def _bucket_add(self, courier_id, load):
+        self.buckets.setdefault(load, {})[courier_id] = None
+
+    def _bucket_remove(self, courier_id, load):
+        bucket = self.buckets[load]
+        del bucket[courier_id]
+        if not bucket:
+            del self.buckets[load]
+
+    def add(self, courier_id, load=0):
+        if courier_id in self.load:
+            self.remove(courier_id)
+        self.load[courier_id] = load
+        self._bucket_add(courier_id, load)
+        if len(self.load) == 1 or load < self.min_load:
+            self.min_load = load
+
+    def remove(self, courier_id):
+        load = self.load.pop(courier_id)
+        self._bucket_remove(courier_id, load)
+        if self.load and load == self.min_load and load not in self.buckets:
+            self.min_load = min(self.buckets)
+
+    def least_loaded(self):
+        if not self.load:
+            return None
+        return next(iter(self.buckets[self.min_load]))
+
+    def increment(self, courier_id):
+        load = self.load[courier_id]
+        self._bucket_remove(courier_id, load)
+        self.load[courier_id] = load + 1
+        # Курьер уходит в конец очереди следующей корзины — так заказы чередуются между равными
+        self._bucket_add(courier_id, load + 1)
+        if load == self.min_load and load not in self.buckets:
+            self.min_load = load + 1
+
+    def decrement(self, courier_id):
+        load = self.load[courier_id]
+        if load == 0:
+            return
+        self._bucket_remove(courier_id, load)
+        self.load[courier_id] = load - 1
+        self._bucket_add(courier_id, load - 1)
+        if load - 1 < self.min_load:
+            self.min_load = load - 1
+
+
+class _GridIndex:
+    """
+    Координаты курьеров в сетке ячеек по cell_km. Поиск идёт кольцами ячеек от точки
+    и останавливается, как только следующие кольца не могут дать курьера ближе уже найденного.
+    """
+
+    def __init__(self, cell_km):
+        self.cell = cell_km / KM_PER_DEGREE  # сторона ячейки, градусы
+        self.cells = {}      # (строка, столбец) -> {courier_id: (lat, lon)}
+        self.positions = {}  # courier_id -> ячейка
+
+    def _key(self, lat, lon):
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def add(self, courier_id, lat, lon):
+        self.remove(courier_id)
+        key = self._key(lat, lon)
+        self.cells.setdefault(key, {})[courier_id] = (lat, lon)
+        self.positions[courier_id] = key
+
+    def remove(self, courier_id):
+        key = self.positions.pop(courier_id, None)
+        if key is None:
+            return
+        cell = self.cells[key]
+        del cell[courier_id]
+        if not cell:
+            del self.cells[key]
+
+    @staticmethod
+    def _ring(row, col, k):
+        if k == 0:
+            yield row, col
+            return
+        for c in range(col - k, col + k + 1):
+            yield row - k, c
+            yield row + k, c
+        for r in range(row - k + 1, row + k):
+            yield r, col - k
+            yield r, col + k
+
+    def nearby(self, lat, lon, radius_km):
+        """(расстояние, courier_id) курьеров в радиусе по возрастанию расстояния"""
+        if not self.positions:
+            return
+        row, col = self._key(lat, lon)
+        # Градус долготы короче градуса широты в cos(lat) раз: это меньшая сторона ячейки, км
+        step_km = self.cell * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        heap = []
+        k = 0
+        while True:
+            for key in self._ring(row, col, k):
+                for courier_id, (courier_lat, courier_lon) in self.cells.get(key, {}).items():
+                    distance = haversine_km(lat, lon, courier_lat, courier_lon)
+                    if distance <= radius_km:
+                        heapq.heappush(heap, (distance, courier_id))
+            # Курьеры из колец дальше k не ближе k * step_km — найденных ближе можно отдавать
+            bound = k * step_km
+            while heap and heap[0][0] <= bound:
+                yield heapq.heappop(heap)
+            if bound > radius_km:
+                return
+            k += 1
+
+
+class CourierDispatcher:
+    """
+    Распределение заказов по курьерам в памяти процесса.
+    Заказ клиента с координатами получает ближайший курьер в радиусе radius_km,
+    у которого меньше max_load открытых заказов; иначе — наименее загруженный курьер района.
+    Индекс обновляется при создании/завершении заказа и по NOTIFY: об изменении курьеров
+    (couriers_changed) и о заказах (order_events). Загрузка курьера после каждого события
+    о заказе перечитывается из таблицы orders, поэтому заказы, назначенные другими репликами,
+    тоже учитываются.
+    """
+
+    CHANNEL = "couriers_changed"
+    ORDERS_CHANNEL = "order_events"
+
+    def __init__(self, db, radius_km=None, max_load=None):
+        self.db = db
+        self.radius_km = radius_km or float(os.getenv("DISPATCH_RADIUS_KM", "5"))
+        self.max_load = max_load or int(os.getenv("DISPATCH_MAX_OPEN_ORDERS", "10"))
+        self.cell_km = float(os.getenv("DISPATCH_GRID_CELL_KM", "1"))
+        self.couriers = {}      # courier_id -> запись курьера
+        self.districts = {}     # район -> _DistrictIndex
+        self.grid = _GridIndex(self.cell_km)
+        self.loaded = False
+
+    def _district_of(self, courier_id):
+        courier = self.couriers.get(courier_id)
+        return courier['district'] if courier else None
+
+    def add_courier(self, courier, load=0):
+        courier_id = courier['telegram_id']
+        old_district = self._district_of(courier_id)
+        if old_district is not None and old_district != courier['district']:
+            self.districts[old_district].remove(courier_id)
+        self.couriers[courier_id] = courier
+        self.districts.setdefault(courier['district'], _DistrictIndex()).add(courier_id, load)
+        location = location_of(courier)
+        if location is not None:
+            self.grid.add(courier_id, *location)
+        else:
+            self.grid.remove(courier_id)
+
+    async def load(self):
+        """Полная загрузка индекса из базы"""
+        rows = await self.db.get_couriers_with_load()
+        self.couriers = {}
+        self.districts = {}
+        self.grid = _GridIndex(self.cell_km)
+        for row in rows:
+            self.add_courier(row, row['open_orders'])
+        self.loaded = True
+        print(f"✅ Индекс курьеров загружен: {len(self.couriers)} курьеров")
+
+    async def start(self):
+        """Загружает индекс и подписывается на уведомления о регистрации курьеров"""
+        await self.load()
+        await self.db.listen(self.CHANNEL, self._on_notify)
+        await self.db.listen(self.ORDERS_CHANNEL, self._on_order_event)
+        self.db.add_reconnect_listener(self._on_reconnect)
+
+    def _on_reconnect(self):
+        # Пока соединения LISTEN не было, изменения курьеров и заказов прошли мимо индекса
+        asyncio.ensure_future(self.load())
+
+    def _on_notify(self, connection, pid, channel, payload):
+        # "*" — массовое изменение (импорт), индекс перечитывается целиком
+        if payload == "*":
+            asyncio.ensure_future(self.load())
+        else:
+            asyncio.ensure_future(self._refresh_courier(int(payload)))
+
+    def _on_order_event(self, connection, pid, channel, payload):
+        event = json.loads(payload)
+        # Переходы между открытыми состояниями (принят, в пути) загрузку не меняют
+        if event['courier_id'] is None or (event['from'] in OPEN_STATUSES and event['to'] in OPEN_STATUSES):
+            return
+        asyncio.ensure_future(self._refresh_courier(event['courier_id']))
+
+    async def _refresh_courier(self, courier_id):
+        row = await self.db.get_courier_with_load(courier_id)
+        if row:
+            self.add_courier(row, row['open_orders'])
+
+    def _load_of(self, courier_id):
+        return self.districts[self._district_of(courier_id)].load[courier_id]
+
+    def nearest(self, lat, lon):
+        """Ближайший курьер в радиусе, у которого есть место для заказа"""
+        for _, courier_id in self.grid.nearby(lat, lon, self.radius_km):
+            if self._load_of(courier_id) < self.max_load:
+                return courier_id
+        return None
+
+    async def assign(self, district, location=None):
+        """
+        Возвращает курьера для нового заказа и учитывает на нём заказ: ближайшего к location (lat, lon),
+        а если рядом никого нет — наименее загруженного курьера района
+        """
+        if not self.loaded:
+            return await self.db.match_courier_by_district(district)
+        if location is not None:
+            courier_id = self.nearest(*location)
+            if courier_id is not None:
+                self.districts[self._district_of(courier_id)].increment(courier_id)
+                return self.couriers[courier_id]
+        index = self.districts.get(district)
+        if index is None:
+            return None
+        courier_id = index.least_loaded()
+        if courier_id is None:
+            return None
+        index.increment(courier_id)
+        return self.couriers[courier_id]
+
+    def release(self, courier_id):
+        """
+        Снимает с курьера заказ, учтённый в assign, который не удалось создать.
+        Завершение и отмену заказа учитывает _on_order_event: загрузка перечитывается из базы
+        """
+        district = self._district_of(courier_id)
+        if district is not None:
+            self.districts[district].decrement(courier_id)
+
@@ -0,0 +1,419 @@
+import asyncio
+import itertools
+import json
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from cache import TTLCache
+from orders import OPEN_STATUSES, ORDER_ASSIGNED, ORDER_CANCELLED, ORDER_DELIVERED, ORDER_NEW, TRANSITIONS
+from geo import address_key
+from qr_tokens import QRTokenError, is_signed_token, verify_token
+
+
+class InMemoryDatabase:
+    """
+    Database в памяти с тем же интерфейсом, что и main.Database: для бенчмарков
+    обработчиков без Postgres. Строки возвращаются словарями; NOTIFY доставляется
+    подписчикам listen() через цикл событий, как у asyncpg.
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.acquire_wait_total = 0.0
+        self.acquire_count = 0
+        self.profile_cache = TTLCache(maxsize=1, ttl=0)
+        self.users = {}
+        self.bonuses = {}
+        self.bonus_ledger = []
+        self.residents = {}
+        self.couriers = {}
+        self.orders = {}
+        self.qr_codes = {}
+        self.qr_revocations = {}
+        self.conversations = {}
+        self.user_data = {}
+        self.broadcasts = {}
+        self.geocodes = {}  # ключ адреса -> (lat, lon)
+        self._order_ids = itertools.count(1)
+        self._listeners = defaultdict(list)
+
+    # --- соединение и уведомления ---
+    async def connect(self):
+        pass
+
+    async def close(self):
+        self._listeners.clear()
+
+    async def run_migrations(self):
+        return []
+
+    async def warm_up(self, rounds=2):
+        pass
+
+    async def listen(self, channel, callback):
+        self._listeners[channel].append(callback)
+
+    async def start_cache_invalidation(self):
+        pass
+
+    def add_reconnect_listener(self, callback):
+        pass
+
+    async def try_listener_lock(self, key, on_lost=None):
+        return True
+
+    def _notify(self, channel, payload):
+        loop = asyncio.get_running_loop()
+        for callback in self._listeners[channel]:
+            loop.call_soon(callback, None, 0, channel, payload)
+
+    # --- клиенты ---
+    async def user_exists(self, user_id):
+        return user_id in self.users
+
+    def _geocode(self, address):
+        return self.geocodes.get(address_key(address)) if address else None
+
+    async def add_user(self, user_id, iin, address, phone, district):
+        lat, lon = self._geocode(address) or (None, None)
+        self.users[user_id] = {'user_id': user_id, 'iin': iin, 'address': address, 'phone': phone,
+                               'district': district, 'lat': lat, 'lon': lon}
+
+    async def update_user(self, user_id, iin, address, phone, district):
+        old = self.users.get(user_id)
+        if old is None:
+            return
+        await self.add_user(user_id, iin, address, phone, district)
+        if old['address'] == address and old['lat'] is not None:
+            self.users[user_id].update(lat=old['lat'], lon=old['lon'])
+
+    async def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    async def get_client_district(self, user_id):
+        user = self.users.get(user_id)
+        return user['district'] if user else None
+
+    async def get_bonus_balance(self, user_id):
+        return self.bonuses.get(user_id, 0)
+
+    def _active_order(self, user_id):
+        for order in self.orders.values():
+            if order['user_id'] == user_id and order['status'] in OPEN_STATUSES:
+                return order
+        return None
+
+    async def get_session_snapshot(self, user_id):
+        user = self.users.get(user_id)
+        courier = self.couriers.get(user_id)
+        order = self._active_order(user_id)
+        return {
+            'role': "courier" if courier else "client" if user else None,
+            'user': user,
+            'courier': courier,
+            'balance': self.bonuses.get(user_id, 0),
+            'active_order_id': order['id'] if order else None,
+        }
+
+    # --- бонусы ---
+    def _ledger(self, user_id, delta, reason, order_id=None):
+        self.bonus_ledger.append({'user_id': user_id, 'delta': delta, 'balance_after': self.bonuses[user_id],
+                                  'reason': reason, 'order_id': order_id})
+
+    async def update_residents(self, user_id, adults, children, renters):
+        self.residents[user_id] = {'user_id': user_id, 'adults': adults, 'children': children, 'renters': renters}
+        old = self.bonuses.get(user_id, Decimal(0))
+        self.bonuses[user_id] = Decimal(adults + children + renters) * Decimal("2.5")
+        self._ledger(user_id, self.bonuses[user_id] - old, 'residents')
+
+    async def add_bonus(self, user_id, amount, reason="topup"):
+        if user_id not in self.users:
+            return 0
+        amount = Decimal(str(amount))
+        self.bonuses[user_id] = self.bonuses.get(user_id, Decimal(0)) + amount
+        self._ledger(user_id, amount, reason)
+        return self.bonuses[user_id]
+
+    async def deduct_all_bonus(self, user_id, order_id=None):
+        if user_id in self.bonuses:
+            spent = self.bonuses[user_id]
+            self.bonuses[user_id] = Decimal(0)
+            self._ledger(user_id, -spent, 'redeem', order_id)
+        return 0
+
+    async def deduct_bonus(self, user_id, amount, order_id=None):
+        if user_id not in self.bonuses:
+            return Decimal(0)
+        old = self.bonuses[user_id]
+        self.bonuses[user_id] = max(old - Decimal(str(amount)), Decimal(0))
+        self._ledger(user_id, self.bonuses[user_id] - old, 'redeem', order_id)
+        return self.bonuses[user_id]
+
+    async def reconcile_bonuses(self):
+        totals = defaultdict(Decimal)
+        for entry in self.bonus_ledger:
+            totals[entry['user_id']] += entry['delta']
+        return [{'user_id': user_id, 'balance': balance, 'ledger_total': totals[user_id]}
+                for user_id, balance in self.bonuses.items() if balance != totals[user_id]]
+
+    # --- курьеры ---
+    async def create_couriers(self, full_name, IIN, phone_number, address, email, telegram_id, district):
+        lat, lon = self._geocode(address) or (None, None)
+        self.couriers[telegram_id] = {
+            'telegram_id': telegram_id, 'full_name': full_name, 'iin': IIN, 'phone_number': phone_number,
+            'address': address, 'email': email, 'district': district, 'lat': lat, 'lon': lon,
+        }
+        self._notify("couriers_changed", str(telegram_id))
+
+    async def set_location(self, telegram_id, lat, lon):
+        for rows in (self.users, self.couriers):
+            if telegram_id in rows:
+                rows[telegram_id].update(lat=lat, lon=lon)
+        if telegram_id in self.couriers:
+            self._notify("couriers_changed", str(telegram_id))
+        return telegram_id in self.users, telegram_id in self.couriers
+
+    def _with_load(self, courier):
+        open_orders = sum(1 for o in self.orders.values()
+                          if o['courier_id'] == courier['telegram_id'] and o['status'] in OPEN_STATUSES)
+        return dict(courier, open_orders=open_orders)
+
+    async def get_couriers_with_load(self):
+        return [self._with_load(c) for c in self.couriers.values()]
+
+    async def get_courier_with_load(self, telegram_id):
+        courier = self.couriers.get(telegram_id)
+        return self._with_load(courier) if courier else None
+
+    async def get_courier(self, telegram_id):
+        return self.couriers.get(telegram_id)
+
+    async def match_courier_by_district(self, district):
+        return next((c for c in self.couriers.values() if c['district'] == district), None)
+
+    # --- заказы ---
+    async def create_order(self, user_id, courier_id, description, status=None):
+        if status is None:
+            status = ORDER_ASSIGNED if courier_id is not None else ORDER_NEW
+        order_id = next(self._order_ids)
+        now = datetime.utcnow()
+        self.orders[order_id] = {'id': order_id, 'user_id': user_id, 'courier_id': courier_id,
+                                 'description': description, 'status': status, 'created_at': now, 'updated_at': now}
+        self._notify_order(self.orders[order_id], None, user_id)
+        return order_id
+
+    async def get_orders_for_courier(self, courier_id, status=None, cursor_id=None, direction="next", limit=5):
+        orders = sorted((o for o in self.orders.values() if o['courier_id'] == courier_id
+                         and (status is None or o['status'] in ([status] if isinstance(status, str) else status))),
+                        key=lambda o: (o['created_at'], o['id']), reverse=direction != "prev")
+        if cursor_id is not None and cursor_id in self.orders:
+            cursor = self.orders[cursor_id]
+            key = (cursor['created_at'], cursor['id'])
+            if direction == "prev":
+                orders = [o for o in orders if (o['created_at'], o['id']) > key]
+            else:
+                orders = [o for o in orders if (o['created_at'], o['id']) < key]
+        page = orders[:limit]
+        if direction == "prev":
+            page = page[::-1]
+        return page, len(orders) > limit
+
+    def _coords(self, row):
+        # Сохранённые координаты важнее справочника по адресу
+        if row is None:
+            return None
+        if row.get('lat') is not None:
+            return row['lat'], row['lon']
+        return self._geocode(row.get('address'))
+
+    async def get_route_stops(self, courier_id, limit=50):
+        stops = []
+        for order in sorted(self.orders.values(), key=lambda o: o['created_at']):
+            if order['courier_id'] == courier_id and order['status'] in OPEN_STATUSES:
+                user = self.users.get(order['user_id'])
+                lat, lon = self._coords(user) or (None, None)
+                stops.append({'id': order['id'], 'status': order['status'],
+                              'address': user['address'] if user else None, 'lat': lat, 'lon': lon})
+        return stops[:limit], self._coords(self.couriers.get(courier_id))
+
+    async def get_active_order(self, user_id):
+        return self._active_order(user_id)
+
+    async def complete_order_by_user(self, user_id, courier_id):
+        for order in sorted(self.orders.values(), key=lambda o: o['created_at']):
+            if order['user_id'] == user_id and order['courier_id'] == courier_id \
+                    and order['status'] in TRANSITIONS[ORDER_DELIVERED]:
+                result = await self.transition_order(order['id'], ORDER_DELIVERED, courier_id=courier_id)
+                return order['id'] if result['status'] == "ok" else None
+        return None
+
+    async def transition_order(self, order_id, to_status, courier_id=None, user_id=None):
+        order = self.orders.get(order_id)
+        if order is None or (courier_id is not None and order['courier_id'] != courier_id) \
+                or (user_id is not None and order['user_id'] != user_id):
+            return {'status': "not_found", 'order_id': order_id, 'user_id': None, 'courier_id': None,
+                    'from': None, 'to': None}
+        from_status = order['status']
+        if from_status not in TRANSITIONS.get(to_status, ()):
+            return {'status': "invalid", 'order_id': order_id, 'user_id': None, 'courier_id': None,
+                    'from': from_status, 'to': from_status}
+        order['status'] = to_status
+        order['updated_at'] = datetime.utcnow()
+        if to_status == ORDER_CANCELLED:
+            self.qr_revocations.setdefault(order_id, ORDER_CANCELLED)
+            self.qr_codes = {code: q for code, q in self.qr_codes.items() if q['order_id'] != order_id}
+        self._notify_order(order, from_status, courier_id if courier_id is not None else user_id)
+        return {'status': "ok", 'order_id': order_id, 'user_id': order['user_id'],
+                'courier_id': order['courier_id'], 'from': from_status, 'to': to_status}
+
+    def _notify_order(self, order, from_status, actor):
+        self._notify("order_events", json.dumps({
+            'order_id': order['id'], 'user_id': order['user_id'], 'courier_id': order['courier_id'],
+            'from': from_status, 'to': order['status'], 'actor': actor,
+        }))
+
+    # --- QR ---
+    async def generate_qr(self, user_id, order_id):
+        code = str(uuid.uuid4())
+        self.qr_codes[code] = {'code': code, 'user_id': user_id, 'order_id': order_id,
+                               'expires_at': datetime.utcnow() + timedelta(hours=1)}
+        return code
+
+    async def get_qr_record(self, code):
+        return self.qr_codes.get(code)
+
+    async def get_qr_by_order(self, order_id):
+        return next((q for q in self.qr_codes.values() if q['order_id'] == order_id), None)
+
+    def _complete(self, order, courier_id):
+        from_status = order['status']
+        order['status'] = ORDER_DELIVERED
+        self._notify_order(order, from_status, courier_id)
+        spent = self.bonuses.get(order['user_id'], 0)
+        if order['user_id'] in self.bonuses:
+            self.bonuses[order['user_id']] = Decimal(0)
+            self._ledger(order['user_id'], -spent, 'redeem', order['id'])
+        return {'status': "done", 'order_id': order['id'], 'user_id': order['user_id'], 'spent': spent, 'balance': 0}
+
+    async def redeem_qr(self, code, courier_id):
+        code = code.strip().removeprefix("WATER:")
+        empty = {'order_id': None, 'user_id': None, 'spent': 0, 'balance': 0}
+        if is_signed_token(code):
+            try:
+                order_id, user_id, _ = verify_token(code)
+            except QRTokenError as e:
+                return dict(empty, status=e.reason)
+            if order_id in self.qr_revocations:
+                return dict(empty, status="invalid")
+            order = self.orders.get(order_id)
+            if order is None or order['user_id'] != user_id or order['courier_id'] != courier_id \
+                    or order['status'] not in TRANSITIONS[ORDER_DELIVERED]:
+                return dict(empty, status="no_order")
+            return self._complete(order, courier_id)
+        record = self.qr_codes.get(code)
+        if record is None:
+            return dict(empty, status="invalid")
+        if record['expires_at'] < datetime.utcnow():
+            return dict(empty, status="expired")
+        order = self.orders.get(record['order_id'])
+        if order is None or order['courier_id'] != courier_id or order['status'] not in TRANSITIONS[ORDER_DELIVERED]:
+            return dict(empty, status="no_order")
+        del self.qr_codes[code]
+        return self._complete(order, courier_id)
+
+    # --- массовая загрузка ---
+    async def bulk_upsert_clients(self, records):
+        latest = {record[0]: record for record in records}
+        for user_id, iin, address, phone, district in latest.values():
+            if user_id in self.users:
+                await self.update_user(user_id, iin, address, phone, district)
+            else:
+                await self.add_user(user_id, iin, address, phone, district)
+        self._notify("profile_cache", "*")
+        return len(latest)
+
+    async def bulk_upsert_residents(self, records):
+        latest = {record[0]: record for record in records}
+        for user_id, adults, children, renters in latest.values():
+            self.residents[user_id] = {'user_id': user_id, 'adults': adults, 'children': children, 'renters': renters}
+            old = self.bonuses.get(user_id, Decimal(0))
+            self.bonuses[user_id] = Decimal(adults + children + renters) * Decimal("2.5")
+            self._ledger(user_id, self.bonuses[user_id] - old, 'import')
+        return len(latest)
+
+    async def bulk_upsert_couriers(self, records):
+        latest = {record[5]: record for record in records}
+        for full_name, iin, phone_number, address, email, telegram_id, district in latest.values():
+            old = self.couriers.get(telegram_id)
+            lat, lon = self._geocode(address) or (None, None)
+            if old is not None and old['address'] == address and old['lat'] is not None:
+                lat, lon = old['lat'], old['lon']
+            self.couriers[telegram_id] = {
+                'telegram_id': telegram_id, 'full_name': full_name, 'iin': iin, 'phone_number': phone_number,
+                'address': address, 'email': email, 'district': district, 'lat': lat, 'lon': lon,
+            }
+        self._notify("couriers_changed", "*")
+        return len(latest)
+
+    async def bulk_upsert_geocodes(self, records):
+        latest = {address_key(address): (lat, lon) for address, lat, lon in records}
+        self.geocodes.update(latest)
+        # Как в Database: координаты получают клиенты и курьеры, у которых их ещё нет
+        for row in itertools.chain(self.users.values(), self.couriers.values()):
+            if row['lat'] is None:
+                row['lat'], row['lon'] = self._geocode(row['address']) or (None, None)
+        self._notify("profile_cache", "*")
+        self._notify("couriers_changed", "*")
+        return len(latest)
+
+    # --- рассылки ---
+    async def create_broadcast(self, district, text, created_by, lease):
+        broadcast = {'id': len(self.broadcasts) + 1, 'district': district, 'text': text, 'created_by': created_by,
+                     'status': "running", 'last_user_id': 0, 'sent': 0, 'failed': 0}
+        self.broadcasts[broadcast['id']] = broadcast
+        return broadcast
+
+    async def get_broadcast(self, broadcast_id):
+        return self.broadcasts.get(broadcast_id)
+
+    async def claim_stale_broadcasts(self, lease):
+        return []
+
+    async def checkpoint_broadcast(self, broadcast_id, last_user_id, sent, failed, lease):
+        broadcast = self.broadcasts[broadcast_id]
+        broadcast.update(last_user_id=last_user_id, sent=broadcast['sent'] + sent,
+                         failed=broadcast['failed'] + failed)
+        return broadcast['status']
+
+    async def finish_broadcast(self, broadcast_id, status="done"):
+        broadcast = self.broadcasts[broadcast_id]
+        if broadcast['status'] == "running":
+            broadcast['status'] = status
+        return broadcast
+
+    async def iter_district_recipients(self, district, after_user_id=0, chunk_size=500, segment_size=5000):
+        user_ids = sorted(u for u, user in self.users.items() if user['district'] == district and u > after_user_id)
+        for i in range(0, len(user_ids), chunk_size):
+            yield user_ids[i:i + chunk_size]
+
+    # --- состояние диалогов ---
+    async def load_conversation_states(self, names, keys):
+        return [{'name': name, 'key': key, 'state': self.conversations[(name, key)]}
+                for name, key in zip(names, keys) if (name, key) in self.conversations]
+
+    async def load_user_data(self, user_id):
+        return self.user_data.get(user_id)
+
+    async def save_persistence(self, conversations, users):
+        for name, key, state in conversations:
+            if state is None:
+                self.conversations.pop((name, key), None)
+            else:
+                self.conversations[(name, key)] = state
+        for user_id, data in users:
+            if data is None:
+                self.user_data.pop(user_id, None)
+            else:
+                self.user_data[user_id] = data
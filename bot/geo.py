@@ -0,0 +1,23 @@
+import math
+import re
+
+# Геометрия без numpy: её используют диспетчер и запросы на каждом заказе,
+# а numpy нужен только для построения маршрута (routes.py)
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32  # длина градуса широты
+
+# Ключ адреса в справочнике geocodes: регистр, пробелы, точки и запятые не различаются.
+# SQL-выражение и address_key() должны нормализовать одинаково.
+ADDRESS_KEY_SQL = "btrim(lower(regexp_replace({}, '[[:space:],.]+', ' ', 'g')))"
+_ADDRESS_SEPARATORS = re.compile(r"[\s,.]+")
+
+
+def address_key(address):
+    return _ADDRESS_SEPARATORS.sub(" ", address).lower().strip()
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками, км"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
@@ -1,8 +1,11 @@
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
-import qrcode
-from io import BytesIO
+from qr_render import qr_renderer
 from repo.database import db
+
+QR_TTL = 3600
+
+
 async def check_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE):
     balance = await db.get_bonus_balance(update.effective_user.id)
     balance = balance if balance is not None else 0  # Если None, заменяем на 0
@@ -12,16 +15,14 @@ async def check_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def use_bonus(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     code = await db.generate_qr(user_id)
+    data = f"WATER:{code}"
 
-    img = qrcode.make(f"WATER:{code}")
-    bio = BytesIO()
-    img.save(bio, format="PNG")
-    bio.seek(0)
-
-    await update.message.reply_photo(
-        photo=bio,
+    # Рендер выполняется в пуле процессов и не блокирует обработку других обновлений
+    message = await update.message.reply_photo(
+        photo=await qr_renderer.photo(data, QR_TTL),
         caption="🔑 QR-код действителен 1 час"
     )
+    qr_renderer.remember(data, message, QR_TTL)
 
 def get_handlers():
     return [
@@ -14,3 +14,70 @@ def inline_menu():
         [InlineKeyboardButton("Отмена", callback_data="cancel")]
     ]
     return InlineKeyboardMarkup(keyboard)
+
+
+# ========================
+# Готовые (неизменяемые) клавиатуры статических меню
+# ========================
+MAIN_MENU_BUTTON = InlineKeyboardButton("Главное меню", callback_data="main_menu")
+
+
+def _client_menu_rows(active_order_id):
+    rows = [
+        [InlineKeyboardButton("Регистрация клиента", callback_data="client_register")],
+        [InlineKeyboardButton("Мой профиль", callback_data="client_profile")],
+        [InlineKeyboardButton("Обновить данные", callback_data="client_update")],
+        [InlineKeyboardButton("Проверить бонусы", callback_data="client_check_bonus")],
+        [InlineKeyboardButton("Сделать заказ", callback_data="client_order")],
+        [InlineKeyboardButton("Пополнить бонусы", callback_data="client_topup_bonus")],
+    ]
+    # Кнопки получения QR и отмены показываются только при активном заказе;
+    # отмена относится к конкретному заказу, а не к тому, что окажется активным при нажатии
+    if active_order_id is not None:
+        rows.insert(4, [InlineKeyboardButton("Получить бонус (QR‑код)", callback_data="client_use_bonus")])
+        rows.insert(5, [InlineKeyboardButton("Отменить заказ", callback_data=f"order:client_cancel:{active_order_id}")])
+    return rows
+
+
+ROLE_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Клиент", callback_data="role_client")],
+    [InlineKeyboardButton("Курьер", callback_data="role_courier")],
+])
+
+BACK_TO_MAIN_MENU = InlineKeyboardMarkup([[MAIN_MENU_BUTTON]])
+
+# С кнопкой "Главное меню" -> клавиатура клиента без активного заказа
+CLIENT_MENUS = {
+    with_main: InlineKeyboardMarkup(_client_menu_rows(None) + ([[MAIN_MENU_BUTTON]] if with_main else []))
+    for with_main in (False, True)
+}
+
+
+def client_menu(active_order_id, with_main):
+    """Меню клиента; при активном заказе в кнопке отмены — номер заказа"""
+    if active_order_id is None:
+        return CLIENT_MENUS[with_main]
+    return InlineKeyboardMarkup(
+        _client_menu_rows(active_order_id) + ([[MAIN_MENU_BUTTON]] if with_main else [])
+    )
+
+
+COURIER_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Регистрация курьера", callback_data="courier_register")],
+    [InlineKeyboardButton("Мой профиль", callback_data="courier_profile")],
+    [InlineKeyboardButton("Заказы", callback_data="courier_orders")],
+    [InlineKeyboardButton("Оптимальный маршрут", callback_data="courier_route")],
+    [InlineKeyboardButton("Поддержка", callback_data="courier_support")],
+    [InlineKeyboardButton("Завершить заказ", callback_data="courier_complete_order")],
+    [MAIN_MENU_BUTTON],
+])
+
+# Меню после регистрации курьера — без кнопки регистрации
+REGISTERED_COURIER_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Мой профиль", callback_data="courier_profile")],
+    [InlineKeyboardButton("Заказы", callback_data="courier_orders")],
+    [InlineKeyboardButton("Оптимальный маршрут", callback_data="courier_route")],
+    [InlineKeyboardButton("Поддержка", callback_data="courier_support")],
+    [InlineKeyboardButton("Завершить заказ", callback_data="courier_complete_order")],
+    [MAIN_MENU_BUTTON],
+])
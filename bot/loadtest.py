@@ -0,0 +1,269 @@
+"""
+Нагрузочный тест: настоящее приложение из build_application() против локального Postgres
+и поддельного Bot API. Симулирует регистрацию курьеров и клиентов, заказы, выдачу QR-кодов
+и завершение заказов курьерами; печатает пропускную способность, p50/p99 и ошибки.
+
+    LOADTEST_DATABASE_URL=postgresql://localhost/water_load python bot/loadtest.py --clients 2000 --couriers 200
+
+База должна быть отдельной: тест создаёт пользователей с id от 10_000_000 и курьеров от 20_000_000.
+DATABASE_URL (в том числе из .env, который читает import main) не используется — без
+LOADTEST_DATABASE_URL тест не запускается.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+os.environ.setdefault("BOT_TOKEN", "0:loadtest")
+os.environ.setdefault("ANSWER_BACKEND", "stub")
+# У поддельного Bot API нет лимитов Telegram: общий лимит отправки не должен заслонять стоимость обработчиков
+os.environ.setdefault("SEND_GLOBAL_RATE", "100000")
+
+import main  # noqa: E402  (переменные окружения должны быть заданы до импорта)
+
+CLIENT_ID_BASE = 10_000_000
+COURIER_ID_BASE = 20_000_000
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "WaterBot", "username": "water_bot"}
+
+
+class FakeBotTransport(BaseRequest):
+    """
+    Заменяет HTTPXRequest: отвечает на методы Bot API локально с заданной задержкой
+    и запоминает отправленные сообщения по чатам.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = defaultdict(int)
+        self.last_caption = {}  # chat_id -> подпись последнего фото (в ней QR-код)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _message(self, params):
+        chat_id = int(params.get("chat_id", 0) or 0)
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if "caption" in params:
+            file_id = f"photo-{next(self._file_ids)}"
+            message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 300, "height": 300}]
+            message["caption"] = params["caption"]
+            self.last_caption[chat_id] = params["caption"]
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        self.calls[api_method] += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        params = request_data.parameters if request_data is not None else {}
+        if api_method == "getMe":
+            result = BOT_USER
+        elif api_method in ("sendMessage", "sendPhoto", "editMessageText"):
+            result = self._message(params)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class LoadGenerator:
+    def __init__(self, app, transport, districts):
+        self.app = app
+        self.transport = transport
+        self.districts = districts
+        self.update_ids = itertools.count(1)
+        self.latencies = defaultdict(list)  # вид обновления -> секунды
+        self.errors = defaultdict(int)
+        self.kind_of = {}                   # update_id -> вид обновления (для обработчика ошибок)
+        self.courier_locks = defaultdict(asyncio.Lock)
+        app.add_error_handler(self._on_error)
+
+    async def _on_error(self, update, context):
+        kind = self.kind_of.get(getattr(update, "update_id", None), "unknown")
+        self.errors[f"{kind}: {type(context.error).__name__}"] += 1
+
+    @staticmethod
+    def _user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    async def _process(self, kind, payload):
+        update_id = next(self.update_ids)
+        payload["update_id"] = update_id
+        update = Update.de_json(payload, self.app.bot)
+        self.kind_of[update_id] = kind
+        started = time.perf_counter()
+        try:
+            # Через процессор обновлений, как при polling: глобальный лимит и очередь чата
+            await self.app.update_processor.process_update(update, self.app.process_update(update))
+        finally:
+            self.latencies[kind].append(time.perf_counter() - started)
+            self.kind_of.pop(update_id, None)
+
+    async def text(self, kind, user_id, text):
+        await self._process(kind, {"message": {
+            "message_id": next(self.update_ids), "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"}, "from": self._user(user_id), "text": text,
+        }})
+
+    async def button(self, kind, user_id, data):
+        await self._process(kind, {"callback_query": {
+            "id": str(next(self.update_ids)), "from": self._user(user_id), "chat_instance": str(user_id),
+            "data": data, "message": {
+                "message_id": 1, "date": int(time.time()), "chat": {"id": user_id, "type": "private"},
+                "from": BOT_USER, "text": "Выберите действие:",
+            },
+        }})
+
+    async def register_courier(self, courier_id):
+        district = self.districts[courier_id % len(self.districts)]
+        await self.button("courier_register", courier_id, "courier_register")
+        for answer in (f"Курьер {courier_id}", f"{courier_id:012d}", f"+7700{courier_id}",
+                       f"ул. Курьерская, {courier_id}", f"c{courier_id}@example.com", district):
+            await self.text("courier_register_step", courier_id, answer)
+
+    async def register_client(self, user_id):
+        district = self.districts[user_id % len(self.districts)]
+        await self.button("client_register", user_id, "client_register")
+        for answer in (f"{user_id:012d}", f"ул. Тестовая, {user_id}", f"+7701{user_id}", district, "1234"):
+            await self.text("client_register_step", user_id, answer)
+
+    async def order_cycle(self, user_id):
+        await self.button("client_order", user_id, "client_order")
+        await self.button("client_use_bonus", user_id, "client_use_bonus")
+        caption = self.transport.last_caption.pop(user_id, None)
+        if caption is None:
+            self.errors["client_use_bonus: no QR"] += 1
+            return
+        code = caption.split("\n")[1]
+        # Курьер узнаёт о заказе из очереди уведомлений; тест берёт его из базы, чтобы не ждать лимитов отправки
+        order = await main.db.get_active_order(user_id)
+        if order is None:
+            self.errors["client_order: no order"] += 1
+            return
+        courier_id = order["courier_id"]
+        async with self.courier_locks[courier_id]:
+            await self.button("courier_complete_order", courier_id, "courier_complete_order")
+            await self.text("courier_complete_qr", courier_id, code)
+        if random.random() < 0.5:
+            await self.button("client_check_bonus", user_id, "client_check_bonus")
+
+    async def client_session(self, user_id, rounds, semaphore):
+        async with semaphore:
+            await self.register_client(user_id)
+            for _ in range(rounds):
+                await self.order_cycle(user_id)
+
+    def report(self, elapsed):
+        total = sum(len(v) for v in self.latencies.values())
+        rows = []
+        for kind, values in sorted(self.latencies.items()):
+            values.sort()
+            rows.append({
+                "kind": kind,
+                "count": len(values),
+                "p50_ms": round(values[int(0.50 * (len(values) - 1))] * 1000, 2),
+                "p99_ms": round(values[int(0.99 * (len(values) - 1))] * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            })
+        return {
+            "updates": total,
+            "seconds": round(elapsed, 2),
+            "updates_per_sec": round(total / elapsed, 1) if elapsed else 0.0,
+            "errors": dict(self.errors),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "api_calls": dict(self.transport.calls),
+            "by_kind": rows,
+        }
+
+
+def print_report(report):
+    print(f"Обновлений: {report['updates']} за {report['seconds']} с — {report['updates_per_sec']} обновлений/с")
+    print(f"{'вид':<24}{'кол-во':>8}{'p50, мс':>10}{'p99, мс':>10}{'max, мс':>10}")
+    for row in report["by_kind"]:
+        print(f"{row['kind']:<24}{row['count']:>8}{row['p50_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    print(f"Доля ошибок: {report['error_rate']:.2%}")
+    for error, count in sorted(report["errors"].items()):
+        print(f"  ❌ {error}: {count}")
+
+
+def use_loadtest_database():
+    # Не даём тесту попасть в рабочую базу из DATABASE_URL/.env
+    url = os.getenv("LOADTEST_DATABASE_URL")
+    if not url:
+        print("❌ LOADTEST_DATABASE_URL не задан: нагрузочный тест пишет в базу и нужна отдельная база")
+        sys.exit(2)
+    main.db.db_url = url
+
+
+async def run(args):
+    if isinstance(main.db, main.Database):
+        # benchmark.py handlers подменяет main.db на InMemoryDatabase — база не нужна
+        use_loadtest_database()
+    transport = FakeBotTransport(delay=args.api_delay)
+    app = main.build_application(request=transport)
+    districts = [f"Район {i}" for i in range(1, args.districts + 1)]
+    generator = LoadGenerator(app, transport, districts)
+    await app.initialize()
+    await app.post_init(app)
+    await app.start()
+    try:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited(coro):
+            async with semaphore:
+                await coro
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(generator.register_courier(COURIER_ID_BASE + i)) for i in range(args.couriers)))
+        # Курьеры регистрируются до клиентов, чтобы заказам было кого назначить
+        await asyncio.gather(*(generator.client_session(CLIENT_ID_BASE + i, args.rounds, semaphore)
+                               for i in range(args.clients)))
+        report = generator.report(time.perf_counter() - started)
+    finally:
+        await app.stop()
+        await app.shutdown()
+        await app.post_shutdown(app)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--couriers", type=int, default=100)
+    parser.add_argument("--districts", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=2, help="заказов на клиента")
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременных пользователей")
+    parser.add_argument("--api-delay", type=float, default=0.02, help="задержка поддельного Bot API, с")
+    parser.add_argument("--json", help="сохранить отчёт в JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
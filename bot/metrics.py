@@ -0,0 +1,236 @@
+import asyncio
+import functools
+import inspect
+import os
+import time
+
+from telegram.ext import Application, ConversationHandler
+from telegram.request import HTTPXRequest
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values = {}
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.buckets = buckets
+        self.values = {}  # метки -> [счётчики по корзинам..., сумма, количество]
+
+    def observe(self, value, *label_values):
+        data = self.values.get(label_values)
+        if data is None:
+            data = self.values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, data):
+                labels = _format_labels(self.labels + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labels + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {data[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # функции, обновляющие метрики перед выдачей
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HANDLER_LATENCY = registry.add(Histogram("bot_handler_seconds", "Время работы обработчика", ("handler",)))
+HANDLER_ERRORS = registry.add(Counter("bot_handler_errors_total", "Ошибки в обработчиках", ("handler",)))
+UPDATE_LATENCY = registry.add(Histogram("bot_update_seconds", "Полное время обработки обновления"))
+UPDATES_IN_FLIGHT = registry.add(Gauge("bot_updates_in_flight", "Обновления в обработке"))
+DB_LATENCY = registry.add(Histogram("bot_db_query_seconds", "Время вызова метода Database", ("method",)))
+DB_ERRORS = registry.add(Counter("bot_db_errors_total", "Ошибки методов Database", ("method",)))
+DB_ACQUIRE_WAIT = registry.add(Histogram("bot_db_pool_acquire_seconds", "Ожидание соединения из пула"))
+DB_POOL_SIZE = registry.add(Gauge("bot_db_pool_connections", "Соединения пула", ("state",)))
+BOT_READY = registry.add(Gauge("bot_ready", "1 — прогрев завершён, бот принимает обновления"))
+TELEGRAM_LATENCY = registry.add(Histogram("bot_telegram_request_seconds", "Запросы к Bot API", ("method",)))
+TELEGRAM_ERRORS = registry.add(Counter("bot_telegram_errors_total", "Ошибки запросов к Bot API", ("method",)))
+
+
+def _timed(func, histogram, errors, name):
+    # Повторная сборка приложения не должна оборачивать обработчики дважды
+    if getattr(func, "_timed", False):
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc(name)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started, name)
+    wrapper._timed = True
+    return wrapper
+
+
+def instrument_handlers(handlers):
+    """Оборачивает callback каждого обработчика, включая вложенные в ConversationHandler"""
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            nested = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                nested.extend(state_handlers)
+            instrument_handlers(nested)
+        elif getattr(handler, "callback", None) is not None and inspect.iscoroutinefunction(handler.callback):
+            name = getattr(handler.callback, "__name__", "handler")
+            handler.callback = _timed(handler.callback, HANDLER_LATENCY, HANDLER_ERRORS, name)
+
+
+def instrument_router(router):
+    """Замеряет обработчики маршрутизатора callback-кнопок по имени маршрута"""
+    for route, callback in router.routes.items():
+        router.routes[route] = _timed(callback, HANDLER_LATENCY, HANDLER_ERRORS, route)
+
+
+def instrument_database(db):
+    """Оборачивает публичные async-методы Database и публикует состояние пула"""
+    for name, _ in inspect.getmembers(type(db), inspect.iscoroutinefunction):
+        if name.startswith("_"):
+            continue
+        setattr(db, name, _timed(getattr(db, name), DB_LATENCY, DB_ERRORS, name))
+
+    def collect_pool():
+        if db.pool is not None:
+            DB_POOL_SIZE.set(db.pool.get_size(), "total")
+            DB_POOL_SIZE.set(db.pool.get_idle_size(), "idle")
+    registry.collectors.append(collect_pool)
+
+
+def register_stats(prefix, stats_source, help_text):
+    """Публикует словарь числовой статистики (кэш, очередь отправки, маршрутизатор) как gauge"""
+    gauge = registry.add(Gauge(prefix, help_text, ("key",)))
+
+    def collect():
+        for key, value in stats_source().items():
+            gauge.set(value, key)
+    registry.collectors.append(collect)
+
+
+class InstrumentedApplication(Application):
+    async def process_update(self, update):
+        UPDATES_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            return await super().process_update(update)
+        finally:
+            UPDATES_IN_FLIGHT.dec()
+            UPDATE_LATENCY.observe(time.perf_counter() - started)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    async def do_request(self, url, method, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            TELEGRAM_ERRORS.inc(api_method)
+            raise
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, api_method)
+
+
+def is_ready():
+    return BOT_READY.values.get((), 0) == 1
+
+
+async def _serve_metrics(reader, writer):
+    try:
+        request = await reader.readuntil(b"\r\n\r\n")
+        path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b"/"
+        status = "200 OK"
+        if path == b"/ready":
+            # Проба готовности для выката: 503, пока post_init не закончил прогрев
+            status, body = ("200 OK", b"ready") if is_ready() else ("503 Service Unavailable", b"warming up")
+        elif path == b"/health":
+            body = b"ok"
+        else:
+            body = registry.render().encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n".encode()
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port=None):
+    """HTTP-эндпоинт с метриками в формате Prometheus и пробами /health, /ready (режим polling; в webhook-режиме — /metrics)"""
+    port = port or int(os.getenv("METRICS_PORT", "9100"))
+    return await asyncio.start_server(_serve_metrics, os.getenv("METRICS_HOST", "0.0.0.0"), port)
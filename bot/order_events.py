@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+
+from orders import ORDER_ACCEPTED, ORDER_CANCELLED, ORDER_DELIVERED, ORDER_EN_ROUTE
+from sender import PRIORITY_CLIENT
+
+# Ключ advisory-блокировки: уведомления рассылает только одна реплика
+ORDER_EVENTS_LOCK_KEY = 7_311_002
+
+# (новый статус, получатель) -> текст уведомления
+ORDER_EVENT_MESSAGES = {
+    (ORDER_ACCEPTED, "user"): "Курьер принял ваш заказ №{order_id}.",
+    (ORDER_EN_ROUTE, "user"): "Курьер в пути с вашим заказом №{order_id}.",
+    (ORDER_DELIVERED, "user"): "Заказ №{order_id} доставлен. Спасибо!",
+    (ORDER_CANCELLED, "user"): "Заказ №{order_id} отменён.",
+    (ORDER_CANCELLED, "courier"): "Клиент отменил заказ №{order_id}.",
+}
+
+
+class OrderNotifier:
+    """
+    Уведомления клиентам и курьерам о смене состояния заказа. Переходы публикуются
+    базой в канал order_events (NOTIFY в той же транзакции, что и UPDATE), поэтому
+    уведомление уходит только о зафиксированном переходе, какая бы реплика его ни выполнила.
+
+    Подписан на канал только держатель advisory-блокировки; остальные реплики периодически
+    пытаются её занять и подхватывают рассылку, если лидер упал. Если после обрыва соединения
+    LISTEN блокировку заняла другая реплика, эта перестаёт рассылать и снова ждёт своей очереди.
+    Уведомления, пришедшие, пока лидера нет, не повторяются.
+    """
+
+    CHANNEL = "order_events"
+
+    def __init__(self, db, sender, retry_interval=None):
+        self.db = db
+        self.sender = sender
+        self.retry_interval = retry_interval or float(os.getenv("ORDER_EVENTS_RETRY", "30"))
+        self.leader = False
+        self._subscribed = False
+        self._task = None
+
+    async def start(self):
+        if not await self._try_lead():
+            self._task = asyncio.ensure_future(self._retry())
+
+    async def _try_lead(self):
+        if await self.db.try_listener_lock(ORDER_EVENTS_LOCK_KEY, on_lost=self._on_lock_lost):
+            # Подписка переживает потерю лидерства, поэтому оформляется один раз
+            if not self._subscribed:
+                await self.db.listen(self.CHANNEL, self._on_notify)
+                self._subscribed = True
+            self.leader = True
+            print("✅ Реплика рассылает уведомления о заказах")
+        return self.leader
+
+    def _on_lock_lost(self):
+        self.leader = False
+        print("⚠️ Блокировка уведомлений о заказах занята другой репликой")
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._retry())
+
+    async def _retry(self):
+        while True:
+            await asyncio.sleep(self.retry_interval)
+            try:
+                if await self._try_lead():
+                    return
+            except Exception as e:
+                print(f"❌ Ошибка захвата блокировки уведомлений о заказах: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        if not self.leader:
+            return
+        event = json.loads(payload)
+        for role in ("user", "courier"):
+            chat_id = event[f"{role}_id"]
+            # Тот, кто выполнил переход, уже получил ответ от обработчика
+            if chat_id is None or chat_id == event['actor']:
+                continue
+            text = ORDER_EVENT_MESSAGES.get((event['to'], role))
+            if text:
+                self.sender.send(chat_id, text.format(order_id=event['order_id']), priority=PRIORITY_CLIENT)
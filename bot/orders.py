@@ -0,0 +1,37 @@
+# Состояния заказа: new → assigned → accepted → en_route → delivered / cancelled
+ORDER_NEW = "new"              # создан, курьер не назначен
+ORDER_ASSIGNED = "assigned"    # назначен курьер
+ORDER_ACCEPTED = "accepted"    # курьер принял заказ
+ORDER_EN_ROUTE = "en_route"    # курьер в пути
+ORDER_DELIVERED = "delivered"  # доставлен (QR клиента погашен)
+ORDER_CANCELLED = "cancelled"
+
+OPEN_STATUSES = (ORDER_NEW, ORDER_ASSIGNED, ORDER_ACCEPTED, ORDER_EN_ROUTE)
+
+# Целевое состояние -> состояния, из которых в него можно перейти.
+# Доставка возможна сразу после назначения: курьер может погасить QR, не отмечая промежуточные шаги.
+TRANSITIONS = {
+    ORDER_ASSIGNED: (ORDER_NEW,),
+    ORDER_ACCEPTED: (ORDER_ASSIGNED,),
+    ORDER_EN_ROUTE: (ORDER_ACCEPTED,),
+    ORDER_DELIVERED: (ORDER_ASSIGNED, ORDER_ACCEPTED, ORDER_EN_ROUTE),
+    ORDER_CANCELLED: OPEN_STATUSES,
+}
+
+# Литерал для SQL: с ним планировщик использует частичные индексы по открытым заказам
+OPEN_STATUSES_SQL = "(" + ", ".join(f"'{s}'" for s in OPEN_STATUSES) + ")"
+DELIVERABLE_STATUSES_SQL = "(" + ", ".join(f"'{s}'" for s in TRANSITIONS[ORDER_DELIVERED]) + ")"
+
+STATUS_LABELS = {
+    ORDER_NEW: "Новый",
+    ORDER_ASSIGNED: "Назначен курьеру",
+    ORDER_ACCEPTED: "Принят курьером",
+    ORDER_EN_ROUTE: "Курьер в пути",
+    ORDER_DELIVERED: "Доставлен",
+    ORDER_CANCELLED: "Отменён",
+}
+
+# Действия кнопок (callback_data order:<действие>:<id>) -> целевое состояние.
+# Имена действий курьера и клиента не пересекаются: по действию понятно, чью принадлежность проверять
+COURIER_ACTIONS = {"accept": ORDER_ACCEPTED, "go": ORDER_EN_ROUTE, "cancel": ORDER_CANCELLED}
+CLIENT_ACTIONS = {"client_cancel": ORDER_CANCELLED}
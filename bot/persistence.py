@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+
+from telegram.ext import BasePersistence, ConversationHandler, PersistenceInput
+
+from cache import MISSING, TTLCache
+from ptb_compat import check_ptb_version, conversation_key, set_conversation_state
+
+
+class PostgresPersistence(BasePersistence):
+    """
+    Хранит состояния ConversationHandler и user_data в Postgres, чтобы рестарт
+    и несколько реплик за балансировщиком вебхука не теряли незавершённые диалоги.
+
+    Запись отложенная: изменённые ключи копятся и раз в update_interval пишутся в базу
+    одним запросом, при остановке приложения — сразу. Чтение ленивое: user_data —
+    в refresh_user_data, состояния диалогов по ключу обновления — в load_update_state
+    (TypeHandler в группе перед диалогами), и только для ключей, которых нет в кэше
+    загруженных. Дальше источник истины — память процесса, поэтому обновления одного
+    чата должна обрабатывать одна реплика: webhook пересылает их владельцу (WEBHOOK_REPLICAS).
+    Срок жизни кэша должен быть намного больше update_interval: ключ, выпавший из кэша,
+    перечитывается из базы, и к этому моменту его изменения уже должны быть записаны.
+    """
+
+    # Группа обработчика, читающего состояние до ConversationHandler (группа 0)
+    LOAD_GROUP = -1
+
+    def __init__(self, db, update_interval=None, cache_size=100000, cache_ttl=None):
+        check_ptb_version()
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval or float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "5")),
+        )
+        self.db = db
+        cache_ttl = cache_ttl or float(os.getenv("PERSISTENCE_CACHE_TTL", "3600"))
+        self._stored_users = TTLCache(maxsize=cache_size, ttl=cache_ttl)           # user_id -> data_json, как в базе
+        self._loaded_conversations = TTLCache(maxsize=cache_size, ttl=cache_ttl)   # (name, key_json) -> True
+        self._dirty_conversations = {}   # (name, key_json) -> state_json или None (удалить)
+        self._dirty_users = {}           # user_id -> data_json или None (удалить)
+        self._flush_task = None
+        self._write_lock = asyncio.Lock()
+
+    # --- чтение ---
+    async def get_conversations(self, name):
+        # Загрузка всех диалогов при старте не нужна — см. load_update_state
+        return {}
+
+    async def get_user_data(self):
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        stored = self._stored_users.get(user_id)
+        # Данные уже в памяти (или изменены и ещё не записаны) — они новее базы
+        if stored is not MISSING or user_id in self._dirty_users:
+            if stored is not MISSING:
+                self._stored_users.set(user_id, stored)  # продлеваем срок, пока пользователь активен
+            return
+        data = await self.db.load_user_data(user_id)
+        self._stored_users.set(user_id, data)
+        user_data.clear()
+        if data is not None:
+            user_data.update(json.loads(data))
+
+    @staticmethod
+    def _conversation_handlers(application):
+        return [
+            handler
+            for group in application.handlers.values()
+            for handler in group
+            if isinstance(handler, ConversationHandler) and handler.persistent
+        ]
+
+    async def load_update_state(self, update, context):
+        """Читает из базы состояния диалогов для ключа этого обновления, если их нет в памяти"""
+        requests = []
+        for handler in self._conversation_handlers(context.application):
+            key = conversation_key(handler, update)
+            if key is None:
+                continue
+            item = (handler.name, json.dumps(list(key)))
+            loaded = self._loaded_conversations.get(item) is not MISSING
+            self._loaded_conversations.set(item, True)
+            if not loaded and item not in self._dirty_conversations:
+                requests.append((handler, key, item))
+        if not requests:
+            return
+        rows = await self.db.load_conversation_states(
+            [item[0] for _, _, item in requests], [item[1] for _, _, item in requests]
+        )
+        stored = {(row['name'], row['key']): json.loads(row['state']) for row in rows}
+        for handler, key, item in requests:
+            set_conversation_state(handler, key, stored.get(item))
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    # --- запись ---
+    def _schedule_flush(self):
+        # Изменения, которые PTB передаёт за один проход update_persistence (раз в update_interval),
+        # пишутся одним запросом
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(0)
+        try:
+            await self._write()
+        except Exception as e:
+            print(f"❌ Ошибка сохранения состояния диалогов: {e}")
+
+    async def _write(self):
+        async with self._write_lock:
+            conversations, self._dirty_conversations = self._dirty_conversations, {}
+            users, self._dirty_users = self._dirty_users, {}
+            if not conversations and not users:
+                return
+            try:
+                await self.db.save_persistence(
+                    [(name, key, state) for (name, key), state in conversations.items()],
+                    list(users.items()),
+                )
+            except Exception:
+                # Не теряем изменения: возвращаем то, что не было перезаписано новыми
+                for item, state in conversations.items():
+                    self._dirty_conversations.setdefault(item, state)
+                for user_id, data in users.items():
+                    self._dirty_users.setdefault(user_id, data)
+                raise
+            for user_id, data in users.items():
+                self._stored_users.set(user_id, data)
+
+    async def update_conversation(self, name, key, new_state):
+        state = None if new_state is None else json.dumps(new_state)
+        self._dirty_conversations[(name, json.dumps(list(key)))] = state
+        self._schedule_flush()
+
+    async def update_user_data(self, user_id, data):
+        data = json.dumps(data, default=str) if data else None
+        if self._stored_users.get(user_id) == data and user_id not in self._dirty_users:
+            return
+        self._dirty_users[user_id] = data
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id):
+        self._dirty_users[user_id] = None
+        self._schedule_flush()
+
+    async def flush(self):
+        await self._write()
+
+    # --- не используются (store_data отключает chat_data, bot_data и callback_data) ---
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
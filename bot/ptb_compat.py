@@ -0,0 +1,35 @@
+import telegram
+
+# Внутренности ConversationHandler ниже сверены с python-telegram-bot 22.x (см. requirements.txt).
+# При переходе на другую мажорную версию сверить с исходниками PTB и поднять номер.
+SUPPORTED_PTB_MAJOR = 22
+
+
+def check_ptb_version():
+    """Падает при старте, если установлен PTB, под который адаптер не проверялся"""
+    if telegram.__version_info__.major != SUPPORTED_PTB_MAJOR:
+        raise RuntimeError(
+            f"ptb_compat проверен на python-telegram-bot {SUPPORTED_PTB_MAJOR}.x, "
+            f"установлен {telegram.__version__}"
+        )
+
+
+def conversation_key(handler, update):
+    """Ключ диалога ConversationHandler для обновления или None, если у обновления нет нужного чата/пользователя"""
+    try:
+        return handler._get_key(update)
+    except RuntimeError:
+        return None
+
+
+def set_conversation_state(handler, key, state):
+    """
+    Подменяет состояние диалога без отметки об изменении: прочитанное из базы
+    не попадает в следующий update_persistence и не записывается обратно.
+    None — диалога нет.
+    """
+    conversations = handler._conversations
+    if state is None:
+        conversations.data.pop(key, None)
+    else:
+        conversations.update_no_track({key: state})
@@ -0,0 +1,79 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from cache import MISSING, TTLCache
+
+
+def render_png(data):
+    """Рендер QR в PNG; выполняется в отдельном процессе"""
+    import qrcode
+
+    bio = BytesIO()
+    qrcode.make(data).save(bio, format="PNG")
+    return bio.getvalue()
+
+
+class QRRenderer:
+    """
+    Рендер QR-кодов в пуле процессов, чтобы не блокировать event loop.
+    PNG кэшируется до истечения кода, а после первой отправки запоминается
+    file_id Telegram — повторная отправка не передаёт изображение заново.
+    """
+
+    def __init__(self, workers=None, cache_size=5000):
+        self.workers = workers or int(os.getenv("QR_RENDER_WORKERS", "2"))
+        self._executor = None
+        self._png = TTLCache(maxsize=cache_size)
+        self._file_ids = TTLCache(maxsize=cache_size)
+        self._in_flight = {}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def render(self, data, ttl):
+        png = self._png.get(data)
+        if png is not MISSING:
+            return png
+        future = self._in_flight.get(data)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._get_executor(), render_png, data)
+            self._in_flight[data] = future
+        try:
+            png = await asyncio.shield(future)
+        finally:
+            self._in_flight.pop(data, None)
+        self._png.set(data, png, ttl=ttl)
+        return png
+
+    async def photo(self, data, ttl):
+        """Значение для параметра photo: file_id, если код уже отправлялся, иначе PNG"""
+        file_id = self._file_ids.get(data)
+        if file_id is not MISSING:
+            return file_id
+        return await self.render(data, ttl)
+
+    def remember(self, data, message, ttl):
+        if message is not None and message.photo:
+            self._file_ids.set(data, message.photo[-1].file_id, ttl=ttl)
+            # После загрузки в Telegram PNG больше не нужен
+            self._png.invalidate(data)
+
+    async def warm_up(self):
+        # Процессы пула запускаются и импортируют qrcode/PIL до первого запроса клиента;
+        # основной процесс эти модули по-прежнему не загружает
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, render_png, "warmup") for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+qr_renderer = QRRenderer()
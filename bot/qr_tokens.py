@@ -0,0 +1,69 @@
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+
+# Формат токена: "WQ1." + base64url(order_id:u64, user_id:u64, expires_at:u32 + HMAC-SHA256[:12])
+TOKEN_PREFIX = "WQ1."
+_PAYLOAD = struct.Struct(">QQI")
+_MAC_SIZE = 12
+QR_TOKEN_TTL = 3600
+
+
+class QRTokenError(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason  # "invalid" или "expired"
+
+
+def _secret():
+    # Общий секрет для всех реплик; без QR_SECRET выводится из токена бота.
+    # Без обоих ключ был бы общеизвестным (sha256 от "qr:") и токены можно было бы подделать
+    secret = os.getenv("QR_SECRET")
+    if secret:
+        return secret.encode()
+    bot_token = os.getenv("BOT_TOKEN")
+    if not bot_token:
+        raise ValueError("QR_SECRET и BOT_TOKEN не заданы: нечем подписывать QR-токены")
+    return hashlib.sha256(("qr:" + bot_token).encode()).digest()
+
+
+def check_secret():
+    """Проверка при старте: без секрета бот не запускается, а не подписывает токены пустым ключом"""
+    _secret()
+
+
+def _mac(payload):
+    return hmac.new(_secret(), TOKEN_PREFIX.encode() + payload, hashlib.sha256).digest()[:_MAC_SIZE]
+
+
+def is_signed_token(code):
+    return code.startswith(TOKEN_PREFIX)
+
+
+def issue_token(order_id, user_id, ttl=QR_TOKEN_TTL):
+    payload = _PAYLOAD.pack(order_id, user_id, int(time.time()) + ttl)
+    raw = payload + _mac(payload)
+    return TOKEN_PREFIX + base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def verify_token(code, now=None):
+    """Проверяет подпись и срок без обращения к базе. Возвращает (order_id, user_id, expires_at)."""
+    if not is_signed_token(code):
+        raise QRTokenError("invalid")
+    body = code[len(TOKEN_PREFIX):]
+    try:
+        raw = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+    except ValueError:
+        raise QRTokenError("invalid")
+    if len(raw) != _PAYLOAD.size + _MAC_SIZE:
+        raise QRTokenError("invalid")
+    payload, mac = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+    if not hmac.compare_digest(mac, _mac(payload)):
+        raise QRTokenError("invalid")
+    order_id, user_id, expires_at = _PAYLOAD.unpack(payload)
+    if (now if now is not None else time.time()) > expires_at:
+        raise QRTokenError("expired")
+    return order_id, user_id, expires_at
@@ -0,0 +1,40 @@
+import csv
+import time
+
+# Колонки CSV (с заголовком) и их типы для каждого вида импорта
+IMPORT_COLUMNS = {
+    "clients": [("user_id", int), ("iin", str), ("address", str), ("phone", str), ("district", str)],
+    "residents": [("user_id", int), ("adults", int), ("children", int), ("renters", int)],
+    "couriers": [
+        ("full_name", str), ("iin", str), ("phone_number", str), ("address", str),
+        ("email", str), ("telegram_id", int), ("district", str),
+    ],
+    "geocodes": [("address", str), ("lat", float), ("lon", float)],
+}
+
+
+def read_csv_records(path, kind):
+    """Построчно читает CSV и отдаёт кортежи в порядке IMPORT_COLUMNS[kind]"""
+    columns = IMPORT_COLUMNS[kind]
+    with open(path, newline="", encoding="utf-8") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                yield tuple(cast(row[name].strip()) for name, cast in columns)
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"{path}:{line_no}: некорректная строка ({e})") from e
+
+
+async def run_import(db, kind, path):
+    upsert = {
+        "clients": db.bulk_upsert_clients,
+        "residents": db.bulk_upsert_residents,
+        "couriers": db.bulk_upsert_couriers,
+        "geocodes": db.bulk_upsert_geocodes,
+    }[kind]
+    started = time.perf_counter()
+    try:
+        count = await upsert(read_csv_records(path, kind))
+    finally:
+        await db.close()
+    print(f"✅ Импорт {kind}: {count} строк за {time.perf_counter() - started:.1f} с")
+    return count
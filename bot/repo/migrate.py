@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from decimal import Decimal
+
+import asyncpg
+
+from repo import queries
+from repo.pool import database_url
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Ключ advisory-блокировки: миграции применяет только одна реплика одновременно
+MIGRATIONS_LOCK_KEY = 7_311_001
+
+
+def load_migrations():
+    """Список (версия, имя, sql) из файлов вида 001_name.sql, по возрастанию версии"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith(".sql"):
+            continue
+        version = int(filename.split("_", 1)[0])
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as f:
+            migrations.append((version, filename[:-4], f.read()))
+    return migrations
+
+
+async def apply_migrations(conn):
+    """Применяет недостающие миграции, каждую в своей транзакции. Возвращает имена применённых."""
+    applied = []
+    # Таблица версий создаётся под той же блокировкой: реплики, стартующие одновременно,
+    # иначе гонятся на CREATE TABLE IF NOT EXISTS
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATIONS_LOCK_KEY)
+    try:
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+        done = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+        for version, name, sql in load_migrations():
+            if version in done:
+                continue
+            async with conn.transaction():
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", version, name
+                )
+            applied.append(name)
+            print(f"✅ Миграция применена: {name}")
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATIONS_LOCK_KEY)
+    return applied
+
+
+# ========================
+# Проверка планов запросов
+# ========================
+
+# Запросы горячего пути Database (те же константы repo.queries) с типичными параметрами
+HOT_QUERIES = [
+    ("user_exists", queries.USER_EXISTS_SQL, [1]),
+    ("get_user", queries.GET_USER_SQL, [1]),
+    ("get_courier", queries.GET_COURIER_SQL, [1_000_001]),
+    ("get_bonus_balance", queries.GET_BONUS_BALANCE_SQL, [1]),
+    ("get_session_snapshot", queries.SESSION_SNAPSHOT_SQL, [1]),
+    ("add_bonus", queries.ADD_BONUS_SQL, [1, Decimal("2.5"), "topup"]),
+    ("get_courier_with_load", queries.COURIER_WITH_LOAD_SQL, [1_000_001]),
+    ("match_courier_by_district", queries.MATCH_COURIER_BY_DISTRICT_SQL, ["district_1"]),
+    ("create_order", queries.CREATE_ORDER_SQL, [1, 1_000_001, "order", "assigned"]),
+    ("get_qr_record", queries.GET_QR_RECORD_SQL, ["code_1"]),
+    ("get_qr_by_order", queries.GET_QR_BY_ORDER_SQL, [1]),
+    ("get_route_stops", queries.ROUTE_STOPS_SQL, [1_000_001, 50]),
+    ("get_route_start", queries.ROUTE_START_SQL, [1_000_001]),
+    ("get_active_order", queries.GET_ACTIVE_ORDER_SQL, [1]),
+    ("complete_order_by_user", queries.DELIVERABLE_ORDER_SQL, [1, 1_000_002]),
+    ("transition_order", queries.TRANSITION_ORDER_SQL, [1, "accepted", ["assigned"], 1_000_001, None]),
+    ("redeem_signed_qr", queries.REDEEM_SIGNED_QR_SQL, [1, 1, 1_000_001]),
+    ("redeem_stored_qr", queries.REDEEM_STORED_QR_SQL, ["code_1", 1_000_001]),
+    ("load_user_data", queries.LOAD_USER_DATA_SQL, [1]),
+    (
+        "load_conversation_states",
+        queries.LOAD_CONVERSATION_STATES_SQL,
+        [["client_registration", "residents"], ["[1, 1]", "[1, 1]"]],
+    ),
+] + [
+    # Все варианты страницы заказов курьера: с фильтром по состоянию и без, с курсором и без
+    (
+        f"get_orders_for_courier[{'status, ' if filtered else ''}{'cursor, ' if paged else ''}{direction}]",
+        sql,
+        [1_000_001] + ([["accepted", "en_route"]] if filtered else []) + ([1000] if paged else []) + [6],
+    )
+    for (filtered, paged, direction), sql in queries.COURIER_ORDERS_SQL.items()
+]
+
+SEED_SQL = """
+INSERT INTO users (user_id, iin, address, phone, district)
+SELECT g, 'iin', 'address ' || g, 'phone', 'district_' || (g % 50)
+FROM generate_series(1, $1) g ON CONFLICT DO NOTHING;
+INSERT INTO geocodes (address_key, address, lat, lon)
+SELECT 'address ' || g, 'address ' || g, 43.2 + g * 0.00001, 76.9
+FROM generate_series(1, $1) g ON CONFLICT DO NOTHING;
+INSERT INTO bonuses (user_id, balance)
+SELECT g, 10 FROM generate_series(1, $1) g ON CONFLICT DO NOTHING;
+INSERT INTO bonus_ledger (user_id, delta, balance_after, reason)
+SELECT g, 10, 10, 'seed' FROM generate_series(1, $1) g;
+INSERT INTO couriers (full_name, iin, phone_number, address, email, telegram_id, district)
+SELECT 'courier', 'iin', 'phone', 'address ' || g, 'email', 1000000 + g, 'district_' || (g % 50)
+FROM generate_series(1, $1 / 10) g;
+INSERT INTO orders (user_id, courier_id, description, status, created_at, updated_at)
+SELECT g % $1 + 1, 1000000 + g % ($1 / 10) + 1, 'seed order',
+       CASE WHEN g % 20 = 0 THEN 'assigned' ELSE 'delivered' END,
+       NOW() - g * INTERVAL '1 minute', NOW()
+FROM generate_series(1, $1 * 3) g;
+INSERT INTO qr_codes (code, user_id, order_id, expires_at)
+SELECT 'code_' || g, g % $1 + 1, g, NOW() + INTERVAL '1 hour'
+FROM generate_series(1, $1) g ON CONFLICT DO NOTHING;
+INSERT INTO qr_revocations (order_id, reason)
+SELECT g, 'seed' FROM generate_series(1, $1 * 3, 7) g ON CONFLICT DO NOTHING;
+INSERT INTO bot_user_data (user_id, data)
+SELECT g, '{}' FROM generate_series(1, $1) g ON CONFLICT DO NOTHING;
+INSERT INTO bot_conversations (name, key, state)
+SELECT 'client_registration', '[' || g || ', ' || g || ']', '1' FROM generate_series(1, $1) g ON CONFLICT DO NOTHING;
+"""
+
+
+def _seq_scans(plan):
+    nodes = [plan]
+    found = []
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            found.append(node.get("Relation Name"))
+        nodes.extend(node.get("Plans", []))
+    return found
+
+
+async def check_query_plans(conn, rows=20000):
+    """
+    Наполняет таблицы тестовыми данными внутри транзакции, которая затем откатывается,
+    и возвращает список (запрос, таблица) для запросов, план которых содержит Seq Scan.
+    """
+    failures = []
+    tr = conn.transaction()
+    await tr.start()
+    try:
+        # $1 в SEED_SQL — число клиентов; asyncpg не принимает параметры в нескольких командах сразу
+        await conn.execute(SEED_SQL.replace("$1", str(int(rows))))
+        await conn.execute(
+            "ANALYZE users, bonuses, bonus_ledger, couriers, orders, qr_codes, qr_revocations, geocodes, bot_user_data, "
+            "bot_conversations"
+        )
+        for name, sql, params in HOT_QUERIES:
+            plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *params)
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            for relation in _seq_scans(plan[0]["Plan"]):
+                failures.append((name, relation))
+    finally:
+        await tr.rollback()
+    return failures
+
+
+async def run(check_plans=False):
+    conn = await asyncpg.connect(database_url())
+    try:
+        applied = await apply_migrations(conn)
+        if not applied:
+            print("✅ Схема базы актуальна")
+        if check_plans:
+            failures = await check_query_plans(conn)
+            for name, relation in failures:
+                print(f"❌ {name}: последовательное сканирование таблицы {relation}")
+            return not failures
+        return True
+    finally:
+        await conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Миграции схемы базы данных бота")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="проверить, что запросы горячего пути не используют Seq Scan")
+    args = parser.parse_args(argv)
+    ok = asyncio.run(run(check_plans=args.check_plans))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
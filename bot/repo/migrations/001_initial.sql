@@ -0,0 +1,48 @@
+-- Базовые таблицы бота (на существующей базе ничего не меняет)
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    iin TEXT,
+    address TEXT,
+    phone TEXT,
+    district TEXT
+);
+
+CREATE TABLE IF NOT EXISTS bonuses (
+    user_id BIGINT PRIMARY KEY,
+    balance NUMERIC NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS residents (
+    user_id BIGINT PRIMARY KEY,
+    adults INTEGER NOT NULL DEFAULT 0,
+    children INTEGER NOT NULL DEFAULT 0,
+    renters INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS couriers (
+    id SERIAL PRIMARY KEY,
+    full_name TEXT,
+    iin TEXT,
+    phone_number TEXT,
+    address TEXT,
+    email TEXT,
+    telegram_id BIGINT NOT NULL,
+    district TEXT
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    courier_id BIGINT,
+    description TEXT,
+    status TEXT NOT NULL DEFAULT 'new',
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS qr_codes (
+    code TEXT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    order_id INTEGER,
+    expires_at TIMESTAMP NOT NULL
+);
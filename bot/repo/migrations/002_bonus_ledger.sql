@@ -0,0 +1,17 @@
+-- Журнал бонусов; для уже существующих балансов записывается начальная проводка
+CREATE TABLE IF NOT EXISTS bonus_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    delta NUMERIC NOT NULL,
+    balance_after NUMERIC NOT NULL,
+    reason TEXT NOT NULL,
+    order_id INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS bonus_ledger_user_id_idx ON bonus_ledger (user_id) INCLUDE (delta);
+
+INSERT INTO bonus_ledger (user_id, delta, balance_after, reason)
+SELECT b.user_id, b.balance, b.balance, 'opening'
+FROM bonuses b
+WHERE NOT EXISTS (SELECT 1 FROM bonus_ledger l WHERE l.user_id = b.user_id);
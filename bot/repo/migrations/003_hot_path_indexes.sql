@@ -0,0 +1,22 @@
+-- Индексы под запросы Database
+
+-- Список заказов курьера (keyset по created_at, id) и фильтр по статусу без обращения к таблице
+CREATE INDEX IF NOT EXISTS orders_courier_created_idx
+    ON orders (courier_id, created_at DESC, id DESC) INCLUDE (status);
+
+-- Активный заказ клиента (снимок сессии, погашение QR)
+CREATE INDEX IF NOT EXISTS orders_user_new_idx
+    ON orders (user_id, created_at) WHERE status = 'new';
+
+-- Число открытых заказов курьера для диспетчера
+CREATE INDEX IF NOT EXISTS orders_courier_new_idx
+    ON orders (courier_id) WHERE status = 'new';
+
+CREATE INDEX IF NOT EXISTS qr_codes_order_id_idx
+    ON qr_codes (order_id) INCLUDE (code, expires_at);
+
+CREATE INDEX IF NOT EXISTS couriers_district_idx
+    ON couriers (district) INCLUDE (telegram_id);
+
+CREATE INDEX IF NOT EXISTS couriers_telegram_id_idx
+    ON couriers (telegram_id);
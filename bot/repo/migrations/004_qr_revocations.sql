@@ -0,0 +1,6 @@
+-- Отозванные подписанные QR-токены (по заказу)
+CREATE TABLE IF NOT EXISTS qr_revocations (
+    order_id INTEGER PRIMARY KEY,
+    reason TEXT,
+    revoked_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,14 @@
+-- Состояния диалогов и user_data для PostgresPersistence
+CREATE TABLE IF NOT EXISTS bot_conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state JSONB NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (name, key)
+);
+
+CREATE TABLE IF NOT EXISTS bot_user_data (
+    user_id BIGINT PRIMARY KEY,
+    data JSONB NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,22 @@
+-- Рассылки по району: прогресс (последний обработанный user_id и счётчики) сохраняется
+-- после каждой пачки получателей; claimed_until — аренда рассылки репликой
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id SERIAL PRIMARY KEY,
+    district TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_by BIGINT,
+    status TEXT NOT NULL DEFAULT 'running',
+    last_user_id BIGINT NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    claimed_until TIMESTAMP NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS broadcasts_running_idx
+    ON broadcasts (claimed_until) WHERE status = 'running';
+
+-- Получатели рассылки читаются курсором по району в порядке user_id
+CREATE INDEX IF NOT EXISTS users_district_user_id_idx
+    ON users (district, user_id);
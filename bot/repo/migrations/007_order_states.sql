@@ -0,0 +1,16 @@
+-- Явные состояния заказа: new → assigned → accepted → en_route → delivered / cancelled
+UPDATE orders SET status = 'delivered' WHERE status = 'done';
+UPDATE orders SET status = 'assigned' WHERE status = 'new' AND courier_id IS NOT NULL;
+
+ALTER TABLE orders ADD CONSTRAINT orders_status_check
+    CHECK (status IN ('new', 'assigned', 'accepted', 'en_route', 'delivered', 'cancelled'));
+
+-- Частичные индексы по открытым заказам вместо индексов по status = 'new'
+DROP INDEX IF EXISTS orders_user_new_idx;
+DROP INDEX IF EXISTS orders_courier_new_idx;
+
+CREATE INDEX IF NOT EXISTS orders_user_open_idx
+    ON orders (user_id, created_at) WHERE status IN ('new', 'assigned', 'accepted', 'en_route');
+
+CREATE INDEX IF NOT EXISTS orders_courier_open_idx
+    ON orders (courier_id) WHERE status IN ('new', 'assigned', 'accepted', 'en_route');
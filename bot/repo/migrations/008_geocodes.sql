@@ -0,0 +1,9 @@
+-- Локальный справочник координат адресов для планирования маршрутов курьеров.
+-- address_key — нормализованный адрес (geo.ADDRESS_KEY_SQL), по нему ищутся адреса клиентов
+CREATE TABLE IF NOT EXISTS geocodes (
+    address_key TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    lat DOUBLE PRECISION NOT NULL,
+    lon DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,16 @@
+-- Координаты клиентов и курьеров для подбора ближайшего курьера.
+-- Заполняются из справочника geocodes по адресу или геопозицией из Telegram
+ALTER TABLE users ADD COLUMN IF NOT EXISTS lat DOUBLE PRECISION;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS lon DOUBLE PRECISION;
+ALTER TABLE couriers ADD COLUMN IF NOT EXISTS lat DOUBLE PRECISION;
+ALTER TABLE couriers ADD COLUMN IF NOT EXISTS lon DOUBLE PRECISION;
+
+-- Ключ адреса — geo.ADDRESS_KEY_SQL дословно (SQL-файл не может его импортировать,
+-- совпадение проверяет tests/test_migrate.py)
+UPDATE users u SET lat = g.lat, lon = g.lon
+FROM geocodes g
+WHERE u.lat IS NULL AND g.address_key = btrim(lower(regexp_replace(u.address, '[[:space:],.]+', ' ', 'g')));
+
+UPDATE couriers c SET lat = g.lat, lon = g.lon
+FROM geocodes g
+WHERE c.lat IS NULL AND g.address_key = btrim(lower(regexp_replace(c.address, '[[:space:],.]+', ' ', 'g')));
@@ -0,0 +1,270 @@
+# SQL запросов горячего пути. Одни и те же строки выполняет main.Database
+# и проверяет на Seq Scan repo.migrate.check_query_plans, поэтому план проверяется
+# ровно у того запроса, который уходит в базу.
+from orders import DELIVERABLE_STATUSES_SQL, OPEN_STATUSES_SQL, ORDER_CANCELLED
+from geo import ADDRESS_KEY_SQL
+
+USER_EXISTS_SQL = "SELECT 1 FROM users WHERE user_id = $1"
+
+GET_USER_SQL = "SELECT * FROM users WHERE user_id = $1"
+
+GET_COURIER_SQL = "SELECT * FROM couriers WHERE telegram_id = $1"
+
+GET_BONUS_BALANCE_SQL = "SELECT balance FROM bonuses WHERE user_id = $1"
+
+# Роль, профиль, баланс и активный заказ одним запросом — для меню и точек входа
+SESSION_SNAPSHOT_SQL = f"""
+    SELECT
+        u.user_id AS client_id, u.iin AS client_iin, u.address AS client_address,
+        u.phone AS client_phone, u.district AS client_district,
+        c.telegram_id AS courier_id, c.full_name AS courier_full_name, c.iin AS courier_iin,
+        c.phone_number AS courier_phone_number, c.address AS courier_address,
+        c.email AS courier_email, c.district AS courier_district,
+        COALESCE(b.balance, 0) AS balance,
+        o.id AS active_order_id
+    FROM (SELECT $1::bigint AS id) s
+    LEFT JOIN users u ON u.user_id = s.id
+    LEFT JOIN couriers c ON c.telegram_id = s.id
+    LEFT JOIN bonuses b ON b.user_id = s.id
+    LEFT JOIN LATERAL (
+        SELECT id FROM orders WHERE user_id = s.id AND status IN {OPEN_STATUSES_SQL} LIMIT 1
+    ) o ON TRUE
+"""
+
+ADD_BONUS_SQL = """
+    WITH b AS (
+        INSERT INTO bonuses (user_id, balance)
+        SELECT user_id, $2 FROM users WHERE user_id = $1
+        ON CONFLICT (user_id) DO UPDATE
+        SET balance = bonuses.balance + EXCLUDED.balance
+        RETURNING user_id, balance
+    )
+    INSERT INTO bonus_ledger (user_id, delta, balance_after, reason)
+    SELECT user_id, $2, balance, $3 FROM b
+    RETURNING balance_after
+"""
+
+COURIER_WITH_LOAD_SQL = f"""
+    SELECT c.*,
+           (SELECT COUNT(*) FROM orders o
+            WHERE o.courier_id = c.telegram_id AND o.status IN {OPEN_STATUSES_SQL}) AS open_orders
+    FROM couriers c WHERE c.telegram_id = $1
+"""
+
+MATCH_COURIER_BY_DISTRICT_SQL = "SELECT * FROM couriers WHERE district = $1 LIMIT 1"
+
+# Новый заказ публикуется в order_events: по нему реплики пересчитывают загрузку курьера
+CREATE_ORDER_SQL = """
+    WITH o AS (
+        INSERT INTO orders (user_id, courier_id, description, status, created_at, updated_at)
+        VALUES ($1, $2, $3, $4, NOW(), NOW())
+        RETURNING id, user_id, courier_id, status
+    ),
+    n AS (
+        SELECT pg_notify('order_events', json_build_object(
+            'order_id', id, 'user_id', user_id, 'courier_id', courier_id,
+            'from', NULL, 'to', status, 'actor', user_id
+        )::text) FROM o
+    )
+    SELECT (SELECT id FROM o) AS id, (SELECT count(*) FROM n) AS notified
+"""
+
+
+def _courier_orders_sql(filtered, paged, direction):
+    # $1 — курьер, затем массив состояний (filtered), id заказа-курсора (paged) и limit + 1
+    conditions = ["courier_id = $1"]
+    n = 1
+    if filtered:
+        n += 1
+        conditions.append(f"status = ANY(${n}::text[])")
+    comparison, order = (">", "ASC") if direction == "prev" else ("<", "DESC")
+    if paged:
+        n += 1
+        conditions.append(f"(created_at, id) {comparison} (SELECT created_at, id FROM orders WHERE id = ${n})")
+    return f"""
+    SELECT id, description, status, created_at FROM orders
+    WHERE {" AND ".join(conditions)}
+    ORDER BY created_at {order}, id {order}
+    LIMIT ${n + 1}
+"""
+
+
+# Keyset-страницы списка заказов курьера: (фильтр по состоянию, есть курсор, направление) -> SQL
+COURIER_ORDERS_SQL = {
+    (filtered, paged, direction): _courier_orders_sql(filtered, paged, direction)
+    for filtered in (False, True)
+    for paged in (False, True)
+    for direction in ("next", "prev")
+}
+
+GET_QR_RECORD_SQL = "SELECT * FROM qr_codes WHERE code = $1"
+
+GET_QR_BY_ORDER_SQL = "SELECT * FROM qr_codes WHERE order_id = $1"
+
+# Сохранённые координаты клиента (геопозиция или справочник при регистрации) важнее
+# справочника по текущему адресу; справочник — для клиентов без координат
+ROUTE_STOPS_SQL = f"""
+    SELECT o.id, o.status, u.address, COALESCE(u.lat, g.lat) AS lat, COALESCE(u.lon, g.lon) AS lon
+    FROM orders o
+    LEFT JOIN users u ON u.user_id = o.user_id
+    LEFT JOIN geocodes g ON g.address_key = {ADDRESS_KEY_SQL.format("u.address")}
+    WHERE o.courier_id = $1 AND o.status IN {OPEN_STATUSES_SQL}
+    ORDER BY o.created_at
+    LIMIT $2
+"""
+
+ROUTE_START_SQL = f"""
+    SELECT COALESCE(c.lat, g.lat) AS lat, COALESCE(c.lon, g.lon) AS lon FROM couriers c
+    LEFT JOIN geocodes g ON g.address_key = {ADDRESS_KEY_SQL.format("c.address")}
+    WHERE c.telegram_id = $1
+"""
+
+GET_ACTIVE_ORDER_SQL = f"SELECT * FROM orders WHERE user_id = $1 AND status IN {OPEN_STATUSES_SQL} LIMIT 1"
+
+DELIVERABLE_ORDER_SQL = f"""
+    SELECT * FROM orders
+    WHERE user_id = $1 AND courier_id = $2 AND status IN {DELIVERABLE_STATUSES_SQL}
+    ORDER BY created_at LIMIT 1
+"""
+
+# $3 — состояния, из которых допустим переход (orders.TRANSITIONS[$2]); $4/$5 — владелец заказа.
+# При отмене QR заказа отзывается в той же транзакции: подписанный токен — записью в qr_revocations,
+# QR старого формата — удалением из qr_codes
+TRANSITION_ORDER_SQL = f"""
+    WITH old AS (
+        SELECT id, status FROM orders
+        WHERE id = $1
+          AND ($4::bigint IS NULL OR courier_id = $4)
+          AND ($5::bigint IS NULL OR user_id = $5)
+        FOR UPDATE
+    ),
+    o AS (
+        UPDATE orders SET status = $2, updated_at = NOW()
+        FROM old
+        WHERE orders.id = old.id AND old.status = ANY($3::text[])
+        RETURNING orders.id, orders.user_id, orders.courier_id, old.status AS from_status
+    ),
+    n AS (
+        SELECT pg_notify('order_events', json_build_object(
+            'order_id', id, 'user_id', user_id, 'courier_id', courier_id,
+            'from', from_status, 'to', $2::text, 'actor', COALESCE($4, $5)
+        )::text) FROM o
+    ),
+    revoked AS (
+        INSERT INTO qr_revocations (order_id, reason)
+        SELECT id, '{ORDER_CANCELLED}' FROM o WHERE $2::text = '{ORDER_CANCELLED}'
+        ON CONFLICT (order_id) DO NOTHING
+    ),
+    removed AS (
+        DELETE FROM qr_codes WHERE order_id IN (SELECT id FROM o) AND $2::text = '{ORDER_CANCELLED}'
+    )
+    SELECT
+        (SELECT status FROM old) AS current_status,
+        (SELECT id FROM o) AS order_id,
+        (SELECT user_id FROM o) AS user_id,
+        (SELECT courier_id FROM o) AS courier_id,
+        (SELECT count(*) FROM n) AS notified
+"""
+
+# Подписанный токен уже проверен; $1 — заказ, $2 — клиент, $3 — курьер
+REDEEM_SIGNED_QR_SQL = f"""
+    WITH revoked AS (
+        SELECT 1 FROM qr_revocations WHERE order_id = $1
+    ),
+    old AS (
+        SELECT id, status FROM orders
+        WHERE id = $1 AND user_id = $2 AND courier_id = $3 AND status IN {DELIVERABLE_STATUSES_SQL}
+          AND NOT EXISTS (SELECT 1 FROM revoked)
+        FOR UPDATE
+    ),
+    o AS (
+        UPDATE orders SET status = 'delivered', updated_at = NOW()
+        FROM old WHERE orders.id = old.id
+        RETURNING orders.id, orders.user_id, orders.courier_id, old.status AS from_status
+    ),
+    n AS (
+        SELECT pg_notify('order_events', json_build_object(
+            'order_id', id, 'user_id', user_id, 'courier_id', courier_id,
+            'from', from_status, 'to', 'delivered', 'actor', $3::bigint
+        )::text) FROM o
+    ),
+    b AS (
+        UPDATE bonuses SET balance = 0
+        FROM (SELECT balance FROM bonuses WHERE user_id = (SELECT user_id FROM o) FOR UPDATE) old
+        WHERE bonuses.user_id = (SELECT user_id FROM o)
+        RETURNING bonuses.user_id, old.balance AS spent
+    ),
+    l AS (
+        INSERT INTO bonus_ledger (user_id, delta, balance_after, reason, order_id)
+        SELECT user_id, -spent, 0, 'redeem', (SELECT id FROM o) FROM b
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM revoked) AS revoked,
+        (SELECT id FROM o) AS order_id,
+        (SELECT user_id FROM o) AS user_id,
+        COALESCE((SELECT spent FROM b), 0) AS spent,
+        (SELECT count(*) FROM n) AS notified
+"""
+
+# QR старого формата: $1 — код, $2 — курьер
+REDEEM_STORED_QR_SQL = f"""
+    WITH q AS (
+        SELECT code, user_id, order_id, expires_at FROM qr_codes WHERE code = $1 FOR UPDATE
+    ),
+    valid_q AS (
+        SELECT * FROM q WHERE expires_at >= (NOW() AT TIME ZONE 'UTC')
+    ),
+    old AS (
+        SELECT id, status FROM orders
+        WHERE id = (
+            SELECT COALESCE(valid_q.order_id, (
+                SELECT id FROM orders
+                WHERE user_id = valid_q.user_id AND courier_id = $2
+                  AND status IN {DELIVERABLE_STATUSES_SQL}
+                ORDER BY created_at LIMIT 1
+            ))
+            FROM valid_q
+        )
+        AND courier_id = $2 AND status IN {DELIVERABLE_STATUSES_SQL}
+        FOR UPDATE
+    ),
+    o AS (
+        UPDATE orders SET status = 'delivered', updated_at = NOW()
+        FROM old WHERE orders.id = old.id
+        RETURNING orders.id, orders.user_id, orders.courier_id, old.status AS from_status
+    ),
+    n AS (
+        SELECT pg_notify('order_events', json_build_object(
+            'order_id', id, 'user_id', user_id, 'courier_id', courier_id,
+            'from', from_status, 'to', 'delivered', 'actor', $2::bigint
+        )::text) FROM o
+    ),
+    consumed AS (
+        DELETE FROM qr_codes WHERE code IN (SELECT code FROM q) AND EXISTS (SELECT 1 FROM o)
+    ),
+    b AS (
+        UPDATE bonuses SET balance = 0
+        FROM (SELECT balance FROM bonuses WHERE user_id = (SELECT user_id FROM o) FOR UPDATE) old
+        WHERE bonuses.user_id = (SELECT user_id FROM o)
+        RETURNING bonuses.user_id, old.balance AS spent
+    ),
+    l AS (
+        INSERT INTO bonus_ledger (user_id, delta, balance_after, reason, order_id)
+        SELECT user_id, -spent, 0, 'redeem', (SELECT id FROM o) FROM b
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM q) AS found,
+        EXISTS (SELECT 1 FROM valid_q) AS not_expired,
+        (SELECT id FROM o) AS order_id,
+        (SELECT user_id FROM o) AS user_id,
+        COALESCE((SELECT spent FROM b), 0) AS spent,
+        (SELECT count(*) FROM n) AS notified
+"""
+
+LOAD_USER_DATA_SQL = "SELECT data FROM bot_user_data WHERE user_id = $1"
+
+# Состояния диалогов для ключа обновления: $1 — имена ConversationHandler, $2 — ключи (JSON)
+LOAD_CONVERSATION_STATES_SQL = """
+    SELECT name, key, state FROM bot_conversations
+    WHERE (name, key) IN (SELECT * FROM unnest($1::text[], $2::text[]))
+"""
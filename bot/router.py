@@ -0,0 +1,33 @@
+from collections import Counter
+
+from telegram.ext import CallbackQueryHandler
+
+
+class CallbackRouter:
+    """
+    Единый обработчик callback-кнопок: маршрут — часть callback_data до первого ':'
+    (остальное — аргументы), поиск обработчика — по словарю.
+    Ведёт счётчики вызовов по маршрутам.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.counts = Counter()
+
+    def add(self, route, callback):
+        self.routes[route] = callback
+
+    @staticmethod
+    def route_of(data):
+        return data.split(":", 1)[0]
+
+    def handles(self, data):
+        return isinstance(data, str) and self.route_of(data) in self.routes
+
+    async def dispatch(self, update, context):
+        route = self.route_of(update.callback_query.data)
+        self.counts[route] += 1
+        return await self.routes[route](update, context)
+
+    def handler(self):
+        return CallbackQueryHandler(self.dispatch, pattern=self.handles)
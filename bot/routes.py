@@ -0,0 +1,85 @@
+from geo import EARTH_RADIUS_KM
+
+# numpy импортируется внутри функций: маршрут строится только по запросу курьера,
+# и импорт main.py, диспетчера и запросов не загружает numpy
+
+
+def distance_matrix(lat, lon):
+    """Попарные расстояния по формуле гаверсинуса, км"""
+    import numpy as np
+
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour(dist, start=0):
+    """Жадный маршрут: из каждой точки — в ближайшую непосещённую"""
+    import numpy as np
+
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    route = np.empty(n, dtype=int)
+    route[0] = start
+    visited[start] = True
+    for k in range(1, n):
+        nxt = int(np.argmin(np.where(visited, np.inf, dist[route[k - 1]])))
+        route[k] = nxt
+        visited[nxt] = True
+    return route
+
+
+def two_opt(route, dist, max_passes=50):
+    """
+    Улучшение незамкнутого маршрута с фиксированным началом: отрезок route[i..j] разворачивается,
+    если это сокращает путь. Для каждого i выигрыш по всем j считается одним векторным выражением.
+    """
+    import numpy as np
+
+    route = route.copy()
+    n = len(route)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            j = np.arange(i + 1, n)
+            a, b, c = route[i - 1], route[i], route[j]
+            after = route[np.minimum(j + 1, n - 1)]
+            # Рёбра (a, b) и (c, after) заменяются на (a, c) и (b, after); у последней точки ребра дальше нет
+            delta = dist[a, c] - dist[a, b] + np.where(j < n - 1, dist[b, after] - dist[c, after], 0.0)
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                route[i:j[k] + 1] = route[i:j[k] + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def plan_route(stops, start=None):
+    """
+    Порядок объезда точек stops (словари с 'lat' и 'lon'; None — адрес не найден в справочнике).
+    start — (lat, lon) начала маршрута; без него маршрут начинается с первой точки.
+    Возвращает {'stops': точки по порядку с 'leg_km', 'total_km', 'unlocated': точки без координат}.
+    """
+    located = [s for s in stops if s['lat'] is not None and s['lon'] is not None]
+    unlocated = [s for s in stops if s['lat'] is None or s['lon'] is None]
+    if not located:
+        return {'stops': [], 'total_km': 0.0, 'unlocated': unlocated}
+    points = ([start] if start is not None else []) + [(s['lat'], s['lon']) for s in located]
+    lat, lon = zip(*points)
+    dist = distance_matrix(lat, lon)
+    route = two_opt(nearest_neighbour(dist), dist)
+    offset = 1 if start is not None else 0
+    ordered = []
+    for prev, cur in zip(route, route[1:]):
+        ordered.append(dict(located[cur - offset], leg_km=float(dist[prev, cur])))
+    if start is None:
+        ordered.insert(0, dict(located[route[0]], leg_km=0.0))
+    return {
+        'stops': ordered,
+        'total_km': sum(s['leg_km'] for s in ordered),
+        'unlocated': unlocated,
+    }
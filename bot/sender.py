@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+from collections import OrderedDict
+
+from telegram.error import RetryAfter
+from telegram.request import BaseRequest
+
+# Приоритеты очереди: меньше — раньше
+PRIORITY_CLIENT = 0
+PRIORITY_COURIER = 1
+PRIORITY_BULK = 2
+
+MAX_MESSAGE_LENGTH = 4096
+
+# Методы Bot API, которые учитываются в общем лимите Telegram на сообщения
+MESSAGE_METHOD_PREFIXES = ("send", "edit", "copyMessage", "forwardMessage")
+
+# Вызовы Bot API из обработчиков очереди: токен общего лимита уже взят в _worker
+_in_worker = contextvars.ContextVar("sender_in_worker", default=False)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = None
+
+    def take(self, now):
+        """Забирает токен и возвращает 0, либо возвращает время ожидания до появления токена"""
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Outgoing:
+    __slots__ = ("chat_id", "texts", "kwargs", "priority", "seq", "coalesce", "on_result")
+
+    def __init__(self, chat_id, text, kwargs, priority, seq, coalesce, on_result=None):
+        self.chat_id = chat_id
+        self.texts = [text]
+        self.kwargs = kwargs
+        self.priority = priority
+        self.seq = seq
+        self.coalesce = coalesce
+        self.on_result = on_result
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class MessageSender:
+    """
+    Очередь исходящих сообщений с ограничением скорости Telegram:
+    общий лимит (30 сообщений/с) и лимит на чат, обработка 429 (retry_after),
+    приоритеты и склейка ещё не отправленных уведомлений одному чату.
+    Ответы клиентам из обработчиков отправляются напрямую, но берут токен того же
+    общего лимита через ThrottledRequest (acquire).
+    """
+
+    def __init__(self, global_rate=None, per_chat_rate=None, workers=None):
+        global_rate = global_rate or float(os.getenv("SEND_GLOBAL_RATE", "30"))
+        self.per_chat_rate = per_chat_rate or float(os.getenv("SEND_PER_CHAT_RATE", "1"))
+        self.workers = workers or int(os.getenv("SEND_WORKERS", "8"))
+        self.bot = None
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = OrderedDict()   # chat_id -> TokenBucket (последние активные чаты)
+        self._max_chats = 10000
+        self._pending = {}            # chat_id -> неотправленное склеиваемое сообщение
+        self._in_flight = set()
+        self._queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._delayed = 0             # сообщения, отложенные через call_later (в очереди не числятся)
+        self._tasks = []
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "retried": 0, "coalesced": 0, "direct": 0}
+
+    def start(self, bot):
+        self.bot = bot
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def _drain(self):
+        # Отложенное сообщение ставится обратно в очередь до task_done(), поэтому после join()
+        # остаются только те, что ещё ждут своего времени
+        while True:
+            await self._queue.join()
+            if not self._delayed:
+                return
+            await asyncio.sleep(0.05)
+
+    async def stop(self, timeout=5.0):
+        # Даём очереди дослаться, включая отложенные после 429 сообщения, затем останавливаем обработчиков
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Не отправлено сообщений при остановке: {self._queue.qsize() + self._delayed}")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def send(self, chat_id, text, priority=PRIORITY_COURIER, coalesce=False, on_result=None, **kwargs):
+        """
+        Ставит сообщение в очередь и сразу возвращает управление.
+        on_result(ok) вызывается после окончательной отправки или отказа (повторы после 429 не считаются).
+        """
+        pending = self._pending.get(chat_id) if coalesce and on_result is None else None
+        if pending is not None and pending.kwargs == kwargs and \
+                sum(len(t) + 2 for t in pending.texts) + len(text) <= MAX_MESSAGE_LENGTH:
+            pending.texts.append(text)
+            self.stats["coalesced"] += 1
+            return
+        msg = _Outgoing(chat_id, text, kwargs, priority, next(self._seq), coalesce, on_result)
+        if coalesce:
+            self._pending[chat_id] = msg
+        self._queue.put_nowait(msg)
+        self.stats["queued"] += 1
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, 1)
+            if len(self._chats) > self._max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def _take_global(self, loop):
+        while True:
+            now = loop.time()
+            # Во время паузы после 429 токены не забираются: иначе пауза съедает общий лимит
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            wait = self._global.take(now)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def acquire(self):
+        """Ждёт токен общего лимита для сообщения, отправляемого в обход очереди"""
+        if _in_worker.get():
+            return
+        await self._take_global(asyncio.get_running_loop())
+        self.stats["direct"] += 1
+
+    def pause(self, seconds):
+        """Telegram ответил 429: общий лимит не выдаёт токены seconds секунд"""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+
+    def _requeue_later(self, msg, delay):
+        # Повторная постановка не блокирует сообщения другим чатам
+        self._delayed += 1
+        loop = asyncio.get_running_loop()
+        loop.call_later(delay, self._requeue, msg)
+
+    def _requeue(self, msg):
+        self._delayed -= 1
+        self._queue.put_nowait(msg)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        _in_worker.set(True)
+        while True:
+            msg = await self._queue.get()
+            try:
+                if msg.chat_id in self._in_flight:
+                    self._requeue_later(msg, 0.05)
+                    continue
+                chat_wait = self._chat_bucket(msg.chat_id).take(loop.time())
+                if chat_wait > 0:
+                    self._requeue_later(msg, chat_wait)
+                    continue
+                await self._take_global(loop)
+                await self._deliver(msg)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, msg):
+        if msg.coalesce and self._pending.get(msg.chat_id) is msg:
+            del self._pending[msg.chat_id]
+        self._in_flight.add(msg.chat_id)
+        try:
+            await self.bot.send_message(chat_id=msg.chat_id, text="\n\n".join(msg.texts), **msg.kwargs)
+            self.stats["sent"] += 1
+            if msg.on_result is not None:
+                msg.on_result(True)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            seconds = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+            self.pause(seconds)
+            self.stats["retried"] += 1
+            self._requeue_later(msg, seconds)
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"❌ Не удалось отправить сообщение в чат {msg.chat_id}: {e}")
+            if msg.on_result is not None:
+                msg.on_result(False)
+        finally:
+            self._in_flight.discard(msg.chat_id)
+
+
+def is_message_method(api_method):
+    return api_method.startswith(MESSAGE_METHOD_PREFIXES)
+
+
+class ThrottledRequest(BaseRequest):
+    """
+    Обёртка транспорта Bot API: отправка и редактирование сообщений из обработчиков
+    (ответы клиентам) берут токен общего лимита MessageSender, а 429 ставит на паузу
+    и очередь, и прямые ответы.
+    """
+
+    def __init__(self, request, sender):
+        self._request = request
+        self._sender = sender
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def initialize(self):
+        await self._request.initialize()
+
+    async def shutdown(self):
+        await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        throttled = is_message_method(url.rsplit("/", 1)[-1])
+        if throttled:
+            await self._sender.acquire()
+        code, payload = await self._request.do_request(url, method, request_data, *args, **kwargs)
+        if throttled and code == 429:
+            try:
+                retry_after = json.loads(payload)["parameters"]["retry_after"]
+            except (ValueError, KeyError, TypeError):
+                retry_after = None
+            if retry_after:
+                self._sender.pause(float(retry_after))
+        return code, payload
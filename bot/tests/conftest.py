@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули бота импортируются верхнеуровнево, как при запуске из каталога bot/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from answers import FAQ_ANSWERS, AnswerService, find_faq_answer, normalize_question
+
+
+class CountingBackend:
+    def __init__(self):
+        self.questions = []
+
+    async def complete(self, question):
+        self.questions.append(question)
+        return f"ответ: {question}"
+
+
+@pytest.mark.parametrize("question", ["Как сделать заказ?", "как сделать  заказ", "Как сделать заказь"])
+def test_near_exact_question_gets_faq_answer(question):
+    assert find_faq_answer(normalize_question(question)) == FAQ_ANSWERS[2][1]
+
+
+@pytest.mark.parametrize("question", [
+    "Почему курьер опоздал с заказом?",
+    "Можно ли перенести доставку на завтра",
+    "Код домофона 123, оставьте у двери",
+    "Бонусы сгорают?",
+])
+def test_other_questions_go_to_backend(question):
+    async def scenario():
+        backend = CountingBackend()
+        service = AnswerService(backend, concurrency=1, timeout=1)
+        text = await service.answer(question)
+        return backend.questions, text, service.stats
+
+    questions, text, stats = asyncio.run(scenario())
+    assert questions == [question]
+    assert text == f"ответ: {question}"
+    assert stats['faq'] == 0
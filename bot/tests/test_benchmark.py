@@ -0,0 +1,40 @@
+import asyncio
+import random
+
+import benchmark
+from fakedb import InMemoryDatabase
+
+
+def test_every_database_method_has_a_benchmark():
+    assert benchmark.uncovered_methods(benchmark.benchmarks(None, 1, [])) == []
+
+
+def test_uncovered_method_is_reported():
+    entries = [entry for entry in benchmark.benchmarks(None, 1, []) if not entry[0].startswith("get_route_stops")]
+    assert benchmark.uncovered_methods(entries) == ["get_route_stops"]
+
+
+def test_benchmarks_run_against_in_memory_database(monkeypatch):
+    monkeypatch.setenv("QR_SECRET", "test-secret")
+    rows = 20
+
+    async def scenario():
+        db = InMemoryDatabase()
+        for user_id in range(1, rows + 1):
+            await db.add_user(user_id, "iin", f"address {user_id}", "phone", f"district_{user_id % 50}")
+        for i in range(1, rows // 10 + 1):
+            courier_id = benchmark.COURIER_ID_BASE + i
+            await db.create_couriers("courier", "iin", "phone", f"address {i}", "email", courier_id, f"district_{i}")
+        open_orders = []
+        for user_id in range(1, 7):
+            courier_id = benchmark.COURIER_ID_BASE + 1
+            open_orders.append((await db.create_order(user_id, courier_id, "order"), user_id, courier_id))
+        rng = random.Random(1)
+        for name, call in benchmark.benchmarks(db, rows, open_orders):
+            await call(rng)
+
+    asyncio.run(scenario())
+
+
+def test_in_memory_database_implements_every_method():
+    assert sorted(name for name in benchmark.database_methods() if not hasattr(InMemoryDatabase, name)) == []
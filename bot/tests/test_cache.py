@@ -0,0 +1,54 @@
+import cache
+from cache import MISSING, TTLCache
+
+
+def test_get_set_and_cached_none():
+    c = TTLCache(maxsize=10, ttl=60)
+    assert c.get("a") is MISSING
+    c.set("a", None)
+    assert c.get("a") is None
+    assert c.stats()['hits'] == 1 and c.stats()['misses'] == 1
+
+
+def test_lru_eviction_keeps_recently_used():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert c.get("b") is MISSING
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.evictions == 1
+
+
+def test_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    c = TTLCache(maxsize=10, ttl=5)
+    c.set("a", 1)
+    c.set("b", 2, ttl=20)
+    now[0] += 10
+    assert c.get("a") is MISSING
+    assert c.get("b") == 2
+    assert c.stats()['size'] == 1
+
+
+def test_invalidate_and_clear():
+    c = TTLCache()
+    c.set("a", 1)
+    c.invalidate("a")
+    c.invalidate("a")
+    assert c.get("a") is MISSING and c.invalidations == 1
+    c.set("b", 1)
+    c.clear()
+    assert c.get("b") is MISSING
+
+
+def test_set_skipped_after_invalidation_of_missing_key():
+    c = TTLCache()
+    generation = c.generation
+    c.invalidate("a")
+    c.set("a", "stale", generation=generation)
+    assert c.get("a") is MISSING
+    c.set("a", "fresh", generation=c.generation)
+    assert c.get("a") == "fresh"
@@ -0,0 +1,148 @@
+import asyncio
+import random
+
+from dispatcher import CourierDispatcher, _DistrictIndex, _GridIndex
+from fakedb import InMemoryDatabase
+from orders import ORDER_CANCELLED
+from geo import haversine_km
+
+
+def check_invariants(index):
+    # Каждый курьер ровно в одной корзине — своей загрузки; min_load — минимум загрузок
+    in_buckets = {}
+    for load, bucket in index.buckets.items():
+        assert bucket, "пустые корзины удаляются"
+        for courier_id in bucket:
+            assert courier_id not in in_buckets
+            in_buckets[courier_id] = load
+    assert in_buckets == index.load
+    if index.load:
+        assert index.min_load == min(index.load.values())
+
+
+def test_district_index_random_operations():
+    rng = random.Random(1)
+    index = _DistrictIndex()
+    for _ in range(5000):
+        op = rng.random()
+        courier_id = rng.randrange(50)
+        if op < 0.3:
+            index.add(courier_id, rng.randrange(5))
+        elif op < 0.4 and courier_id in index.load:
+            index.remove(courier_id)
+        elif op < 0.7 and courier_id in index.load:
+            index.increment(courier_id)
+        elif courier_id in index.load:
+            index.decrement(courier_id)
+        check_invariants(index)
+        least = index.least_loaded()
+        if index.load:
+            assert index.load[least] == index.min_load
+        else:
+            assert least is None
+
+
+def test_district_index_rotates_equal_couriers():
+    index = _DistrictIndex()
+    for courier_id in (1, 2, 3):
+        index.add(courier_id)
+    picked = []
+    for _ in range(6):
+        courier_id = index.least_loaded()
+        index.increment(courier_id)
+        picked.append(courier_id)
+    assert picked == [1, 2, 3, 1, 2, 3]
+
+
+def test_district_index_decrement_never_negative():
+    index = _DistrictIndex()
+    index.add(1)
+    index.decrement(1)
+    assert index.load[1] == 0
+    check_invariants(index)
+
+
+def test_grid_nearby_matches_brute_force():
+    rng = random.Random(2)
+    grid = _GridIndex(1.0)
+    points = {}
+    for courier_id in range(2000):
+        points[courier_id] = (43.2 + rng.uniform(-0.2, 0.2), 76.9 + rng.uniform(-0.3, 0.3))
+        grid.add(courier_id, *points[courier_id])
+    for _ in range(50):
+        lat, lon = 43.2 + rng.uniform(-0.2, 0.2), 76.9 + rng.uniform(-0.3, 0.3)
+        found = list(grid.nearby(lat, lon, 3.0))
+        expected = sorted((haversine_km(lat, lon, *p), c) for c, p in points.items()
+                          if haversine_km(lat, lon, *p) <= 3.0)
+        assert found == expected
+
+
+def test_grid_add_moves_and_remove_cleans_cells():
+    grid = _GridIndex(1.0)
+    grid.add(1, 43.0, 76.0)
+    grid.add(1, 44.0, 77.0)
+    assert len(grid.cells) == 1
+    grid.remove(1)
+    grid.remove(1)
+    assert grid.cells == {} and grid.positions == {}
+
+
+def courier(telegram_id, district, lat=None, lon=None):
+    return {'telegram_id': telegram_id, 'district': district, 'lat': lat, 'lon': lon}
+
+
+def test_assign_prefers_nearest_then_district():
+    async def scenario():
+        dispatcher = CourierDispatcher(InMemoryDatabase(), radius_km=5, max_load=1)
+        dispatcher.add_courier(courier(1, "A", 43.25, 76.90))
+        dispatcher.add_courier(courier(2, "B", 43.21, 76.90))
+        dispatcher.add_courier(courier(3, "A"))
+        dispatcher.loaded = True
+        # Ближайший — курьер другого района
+        assert (await dispatcher.assign("A", (43.20, 76.90)))['telegram_id'] == 2
+        # У ближайшего нет места (max_load=1) — следующий по расстоянию
+        assert (await dispatcher.assign("A", (43.20, 76.90)))['telegram_id'] == 1
+        # В радиусе никого свободного — наименее загруженный курьер района
+        assert (await dispatcher.assign("A", (43.20, 76.90)))['telegram_id'] == 3
+        dispatcher.release(2)
+        assert (await dispatcher.assign("A", (43.20, 76.90)))['telegram_id'] == 2
+
+    asyncio.run(scenario())
+
+
+def test_load_follows_orders_from_other_replicas():
+    async def scenario():
+        db = InMemoryDatabase()
+        await db.create_couriers("Курьер", "1", "+7", "адрес", "c@example.com", 10, "A")
+        dispatcher = CourierDispatcher(db)
+        await dispatcher.start()
+        assert dispatcher._load_of(10) == 0
+        # Заказ создан другой репликой: локальный индекс его не назначал
+        order_id = await db.create_order(1, 10, "вода")
+        await asyncio.sleep(0.01)
+        assert dispatcher._load_of(10) == 1
+        await db.transition_order(order_id, ORDER_CANCELLED, user_id=1)
+        await asyncio.sleep(0.01)
+        assert dispatcher._load_of(10) == 0
+
+    asyncio.run(scenario())
+
+
+def test_completed_order_is_released_once():
+    async def scenario():
+        db = InMemoryDatabase()
+        await db.create_couriers("Курьер", "1", "+7", "адрес", "c@example.com", 10, "A")
+        dispatcher = CourierDispatcher(db)
+        await dispatcher.start()
+        courier_id = (await dispatcher.assign("A"))['telegram_id']
+        first = await db.create_order(1, courier_id, "вода")
+        courier_id = (await dispatcher.assign("A"))['telegram_id']
+        await db.create_order(2, courier_id, "вода")
+        await asyncio.sleep(0.01)
+        assert dispatcher._load_of(10) == 2
+        # Завершение учитывается только по событию order_events, без ручного release
+        assert await db.complete_order_by_user(1, 10) == first
+        await asyncio.sleep(0.01)
+        assert dispatcher._load_of(10) == 1
+
+    asyncio.run(scenario())
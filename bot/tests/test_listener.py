@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+import main
+from cache import MISSING
+from order_events import OrderNotifier
+
+
+class FakeListenerConnection:
+    def __init__(self, held_locks):
+        self.held_locks = held_locks
+        self.channels = {}
+        self.on_terminate = []
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.channels.setdefault(channel, []).append(callback)
+
+    async def fetchval(self, sql, key):
+        if key in self.held_locks:
+            return False
+        self.held_locks.add(key)
+        return True
+
+    def add_termination_listener(self, callback):
+        self.on_terminate.append(callback)
+
+    async def close(self):
+        self.closed = True
+
+    def terminate(self):
+        # Сервер закрыл соединение: блокировки сессии освобождены
+        self.held_locks.clear()
+        for callback in self.on_terminate:
+            callback(self)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    held_locks = set()
+    connections = []
+
+    async def connect(url):
+        connections.append(FakeListenerConnection(held_locks))
+        return connections[-1]
+
+    monkeypatch.setattr(main.asyncpg, "connect", connect)
+    db = main.Database()
+    return db, connections, held_locks
+
+
+def test_reconnect_restores_listeners_and_flushes_cache(database):
+    db, connections, _ = database
+
+    async def scenario():
+        reconnected = []
+        await db.listen("profile_cache", db._on_profile_changed)
+        await db.listen("couriers_changed", db._on_courier_changed)
+        db.add_reconnect_listener(lambda: reconnected.append(True))
+        db.profile_cache.set(("user", 1), {'user_id': 1})
+        connections[0].terminate()
+        await asyncio.sleep(0)
+        await db._reconnect_task
+        assert len(connections) == 2
+        assert set(connections[1].channels) == {"profile_cache", "couriers_changed"}
+        assert db.profile_cache.get(("user", 1)) is MISSING
+        assert reconnected == [True]
+        await db.close()
+        assert connections[1].closed
+
+    asyncio.run(scenario())
+
+
+def test_lost_lock_stops_order_notifications(database):
+    db, connections, held_locks = database
+
+    class Sender:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, chat_id, text, **kwargs):
+            self.sent.append(chat_id)
+
+    async def scenario():
+        sender = Sender()
+        notifier = OrderNotifier(db, sender, retry_interval=3600)
+        await notifier.start()
+        assert notifier.leader
+        event = '{"order_id": 1, "user_id": 5, "courier_id": 6, "from": "assigned", "to": "accepted", "actor": 6}'
+        notifier._on_notify(None, 0, "order_events", event)
+        assert sender.sent == [5]
+        # Пока соединение было разорвано, блокировку заняла другая реплика
+        connections[0].terminate()
+        held_locks.add(7_311_002)
+        await asyncio.sleep(0)
+        await db._reconnect_task
+        assert not notifier.leader
+        notifier._on_notify(None, 0, "order_events", event)
+        assert sender.sent == [5]
+        await notifier.stop()
+        await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_fetch_is_not_cached(database, monkeypatch):
+    db, _, _ = database
+
+    class Connection:
+        async def fetchrow(self, sql, user_id):
+            # Другая реплика изменила профиль, пока запрос был в пути
+            db._on_profile_changed(None, 0, "profile_cache", f"user:{user_id}")
+            return {'user_id': user_id, 'address': "old"}
+
+    async def get_connection():
+        return Connection()
+
+    async def release_connection(conn):
+        pass
+
+    monkeypatch.setattr(db, "_get_connection", get_connection)
+    monkeypatch.setattr(db, "_release_connection", release_connection)
+
+    async def scenario():
+        assert (await db.get_user(1))['address'] == "old"
+        assert db.profile_cache.get(("user", 1)) is MISSING
+
+    asyncio.run(scenario())
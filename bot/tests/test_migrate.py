@@ -0,0 +1,36 @@
+import asyncio
+import contextlib
+
+from geo import ADDRESS_KEY_SQL
+from repo.migrate import apply_migrations, load_migrations
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, sql, *args):
+        self.statements.append(" ".join(sql.split()))
+
+    async def fetch(self, sql):
+        self.statements.append(sql)
+        return [{'version': version} for version, _, _ in load_migrations()]
+
+    def transaction(self):
+        return contextlib.nullcontext()
+
+
+def test_schema_migrations_is_created_under_the_lock():
+    conn = RecordingConnection()
+    assert asyncio.run(apply_migrations(conn)) == []
+    assert conn.statements[0].startswith("SELECT pg_advisory_lock")
+    assert conn.statements[1].startswith("CREATE TABLE IF NOT EXISTS schema_migrations")
+    assert conn.statements[-1].startswith("SELECT pg_advisory_unlock")
+
+
+def test_coordinates_migration_uses_the_address_key_expression():
+    sql = {name: text for _, name, text in load_migrations()}["009_coordinates"]
+    assert ADDRESS_KEY_SQL.format("u.address") in sql
+    assert ADDRESS_KEY_SQL.format("c.address") in sql
+    # Других вариантов нормализации адреса в миграции нет
+    assert sql.count("regexp_replace") == 2
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from fakedb import InMemoryDatabase
+from keyboards import client_menu
+from orders import ORDER_ASSIGNED, ORDER_CANCELLED
+
+
+class FakeQuery:
+    def __init__(self, user_id, data):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.data = data
+        self.replies = []
+
+    async def answer(self):
+        pass
+
+    async def edit_message_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = InMemoryDatabase()
+    monkeypatch.setattr(main, "db", fake)
+    monkeypatch.setattr(main.dispatcher, "db", fake)
+    return fake
+
+
+def press(user_id, data):
+    query = FakeQuery(user_id, data)
+    asyncio.run(main.order_action(SimpleNamespace(callback_query=query), None))
+    return query.replies
+
+
+async def place_orders(db):
+    await db.add_user(7, "iin", "address", "phone", "A")
+    await db.add_user(8, "iin", "address", "phone", "A")
+    await db.create_couriers("Курьер", "iin", "phone", "address", "c@example.com", 100, "A")
+    return await db.create_order(7, 100, "вода"), await db.create_order(8, 100, "вода")
+
+
+def cancel_button(active_order_id):
+    rows = client_menu(active_order_id, False).inline_keyboard
+    return next(button.callback_data for row in rows for button in row if button.text == "Отменить заказ")
+
+
+def test_client_cancels_order_from_menu(db):
+    own, _ = asyncio.run(place_orders(db))
+    assert press(7, cancel_button(own)) == [f"Заказ №{own} отменён."]
+    assert db.orders[own]['status'] == ORDER_CANCELLED
+
+
+def test_client_cannot_cancel_other_clients_order(db):
+    _, other = asyncio.run(place_orders(db))
+    assert press(7, cancel_button(other)) == ["Заказ не найден."]
+    assert db.orders[other]['status'] == ORDER_ASSIGNED
+
+
+def test_client_action_without_order_id_is_rejected(db):
+    own, _ = asyncio.run(place_orders(db))
+    assert press(7, "order:client_cancel") == ["Действие недоступно."]
+    assert db.orders[own]['status'] == ORDER_ASSIGNED
+
+
+@pytest.mark.parametrize("data", [
+    "courier_orders:all:next:abc", "courier_orders:all:next", "courier_orders:all:back:5", "courier_orders:all:next:-1",
+])
+def test_malformed_orders_page_shows_first_page(db, data):
+    asyncio.run(place_orders(db))
+    query = FakeQuery(100, data)
+    asyncio.run(main.courier_orders(SimpleNamespace(callback_query=query), None))
+    assert query.replies[0].startswith("📦 Ваши заказы")
@@ -0,0 +1,166 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update, User
+from telegram.ext import (
+    Application,
+    CommandHandler,
+    ConversationHandler,
+    ExtBot,
+    MessageHandler,
+    TypeHandler,
+    filters,
+)
+
+from fakedb import InMemoryDatabase
+from persistence import PostgresPersistence
+import ptb_compat
+from ptb_compat import SUPPORTED_PTB_MAJOR
+
+ASKED = 1
+
+
+class CountingDatabase(InMemoryDatabase):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def load_conversation_states(self, names, keys):
+        self.calls.append("load_conversations")
+        return await super().load_conversation_states(names, keys)
+
+    async def load_user_data(self, user_id):
+        self.calls.append("load_user")
+        return await super().load_user_data(user_id)
+
+    async def save_persistence(self, conversations, users):
+        self.calls.append("save")
+        await super().save_persistence(conversations, users)
+
+
+def build(db, replies, **kwargs):
+    persistence = PostgresPersistence(db, **kwargs)
+    app = Application.builder().token("1:a").updater(None).persistence(persistence).build()
+
+    async def ask(update, context):
+        context.user_data['asked'] = True
+        replies.append("ask")
+        return ASKED
+
+    async def answer(update, context):
+        replies.append(f"answer:{context.user_data.get('asked')}")
+        return ConversationHandler.END
+
+    app.add_handler(TypeHandler(Update, persistence.load_update_state), group=PostgresPersistence.LOAD_GROUP)
+    app.add_handler(ConversationHandler(
+        entry_points=[CommandHandler("ask", ask)],
+        states={ASKED: [MessageHandler(filters.TEXT & ~filters.COMMAND, answer)]},
+        fallbacks=[],
+        name="question",
+        persistent=True,
+    ))
+    return app
+
+
+def message(app, update_id, text, user_id=5):
+    data = {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': "Клиент"},
+            'text': text,
+        },
+    }
+    if text.startswith("/"):
+        data['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return Update.de_json(data, app.bot)
+
+
+@pytest.fixture(autouse=True)
+def offline_bot(monkeypatch):
+    async def initialize(self):
+        self._bot_user = User(1, "Бот", True, username="water_bot")
+
+    # Без обращения к Telegram API (getMe)
+    monkeypatch.setattr(ExtBot, "initialize", initialize)
+
+
+async def flush(app):
+    await app.update_persistence()
+    await app.persistence.flush()
+
+
+def test_restart_resumes_conversation():
+    async def scenario():
+        db = InMemoryDatabase()
+        replies = []
+        first, second = build(db, replies), build(db, replies)
+        for app in (first, second):
+            await app.initialize()
+        # Диалог начат до рестарта, а ответ пришёл уже новому процессу
+        await first.process_update(message(first, 1, "/ask"))
+        await flush(first)
+        await second.process_update(message(second, 2, "вода"))
+        assert replies == ["ask", "answer:True"]
+        await flush(second)
+        assert db.conversations == {}
+
+    asyncio.run(scenario())
+
+
+def test_writes_are_batched_until_flush():
+    async def scenario():
+        db = CountingDatabase()
+        replies = []
+        app = build(db, replies)
+        await app.initialize()
+        await app.process_update(message(app, 1, "/ask", user_id=5))
+        await app.process_update(message(app, 2, "/ask", user_id=6))
+        assert "save" not in db.calls
+        assert db.conversations == {}
+        # Изменения обоих пользователей — одним запросом
+        await flush(app)
+        assert db.calls.count("save") == 1
+        assert len(db.conversations) == 2 and set(db.user_data) == {5, 6}
+
+    asyncio.run(scenario())
+
+
+def test_state_is_loaded_once_per_user():
+    async def scenario():
+        db = CountingDatabase()
+        replies = []
+        app = build(db, replies)
+        await app.initialize()
+        await app.process_update(message(app, 1, "/ask"))
+        await app.process_update(message(app, 2, "вода"))
+        await flush(app)
+        await app.process_update(message(app, 3, "/ask"))
+        assert replies == ["ask", "answer:True", "ask"]
+        assert db.calls.count("load_user") == 1
+        assert db.calls.count("load_conversations") == 1
+
+    asyncio.run(scenario())
+
+
+def test_loaded_users_are_bounded():
+    async def scenario():
+        db = CountingDatabase()
+        app = build(db, [], cache_size=1)
+        await app.initialize()
+        for user_id in (5, 6, 5):
+            await app.process_update(message(app, user_id, "/ask", user_id=user_id))
+        # Пользователь 5 вытеснен пользователем 6 и перечитан из базы
+        assert db.calls.count("load_user") == 3
+        assert app.persistence._stored_users.stats()["size"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_unsupported_ptb_version_fails_at_start(monkeypatch):
+    monkeypatch.setattr(ptb_compat.telegram, "__version_info__", SimpleNamespace(major=SUPPORTED_PTB_MAJOR + 1))
+    with pytest.raises(RuntimeError):
+        PostgresPersistence(InMemoryDatabase())
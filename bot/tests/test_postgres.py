@@ -0,0 +1,173 @@
+"""
+Тесты настоящих запросов Database на Postgres: атомарное погашение QR и переходы заказа.
+InMemoryDatabase повторяет эту логику на Python, поэтому SQL (блокировки, CTE) проверяется здесь.
+
+    TEST_DATABASE_URL=postgresql://localhost/water_test python -m pytest bot/tests/test_postgres.py
+
+База TEST_DATABASE_URL очищается перед каждым тестом — только отдельная база!
+Без TEST_DATABASE_URL тесты пропускаются.
+"""
+import asyncio
+import os
+
+import pytest
+
+import main
+from orders import ORDER_ACCEPTED, ORDER_CANCELLED
+from qr_tokens import issue_token
+
+TABLES = "users, bonuses, bonus_ledger, residents, couriers, orders, qr_codes, qr_revocations, geocodes"
+CONCURRENT_SCANS = 8
+
+
+@pytest.fixture
+def database_url():
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    return url
+
+
+async def fresh_database(url):
+    db = main.Database()
+    db.db_url = url
+    await db.connect()
+    await db.run_migrations()
+    conn = await db._get_connection()
+    try:
+        await conn.execute(f"TRUNCATE {TABLES} RESTART IDENTITY")
+    finally:
+        await db._release_connection(conn)
+    return db
+
+
+async def place_order(db, user_id=7, courier_id=100, bonus=10):
+    await db.add_user(user_id, "iin", "address", "phone", "A")
+    if await db.get_courier(courier_id) is None:
+        await db.create_couriers("Курьер", "iin", "phone", "address", "c@example.com", courier_id, "A")
+    if bonus:
+        await db.add_bonus(user_id, bonus)
+    return await db.create_order(user_id, courier_id, "вода")
+
+
+async def fetchval(db, sql, *args):
+    conn = await db._get_connection()
+    try:
+        return await conn.fetchval(sql, *args)
+    finally:
+        await db._release_connection(conn)
+
+
+def run(url, scenario):
+    async def wrapper():
+        db = await fresh_database(url)
+        try:
+            await scenario(db)
+        finally:
+            await db.close()
+
+    asyncio.run(wrapper())
+
+
+def test_stored_qr_is_redeemed_once_under_concurrent_scans(database_url):
+    async def scenario(db):
+        order_id = await place_order(db)
+        code = await db.generate_qr(7, order_id)
+        results = await asyncio.gather(*(db.redeem_qr(code, 100) for _ in range(CONCURRENT_SCANS)))
+        assert [r['status'] for r in results].count("done") == 1
+        assert await fetchval(db, "SELECT status FROM orders WHERE id = $1", order_id) == "delivered"
+        assert await fetchval(db, "SELECT count(*) FROM bonus_ledger WHERE reason = 'redeem'") == 1
+        assert await fetchval(db, "SELECT balance FROM bonuses WHERE user_id = 7") == 0
+
+    run(database_url, scenario)
+
+
+def test_stored_qr_of_other_courier_is_not_redeemed(database_url):
+    async def scenario(db):
+        order_id = await place_order(db)
+        code = await db.generate_qr(7, order_id)
+        await db.create_couriers("Курьер", "iin", "phone", "address", "c@example.com", 101, "A")
+        assert (await db.redeem_qr(code, 101))['status'] == "no_order"
+        assert await fetchval(db, "SELECT status FROM orders WHERE id = $1", order_id) == "assigned"
+
+    run(database_url, scenario)
+
+
+def test_signed_qr_is_redeemed_once_under_concurrent_scans(database_url, monkeypatch):
+    monkeypatch.setenv("QR_SECRET", "test-secret")
+
+    async def scenario(db):
+        order_id = await place_order(db)
+        code = issue_token(order_id, 7)
+        results = await asyncio.gather(*(db.redeem_qr(code, 100) for _ in range(CONCURRENT_SCANS)))
+        statuses = [r['status'] for r in results]
+        assert statuses.count("done") == 1 and statuses.count("no_order") == CONCURRENT_SCANS - 1
+        assert await fetchval(db, "SELECT count(*) FROM bonus_ledger WHERE reason = 'redeem'") == 1
+
+    run(database_url, scenario)
+
+
+def test_signed_qr_of_other_order_or_courier_is_not_redeemed(database_url, monkeypatch):
+    monkeypatch.setenv("QR_SECRET", "test-secret")
+
+    async def scenario(db):
+        order_id = await place_order(db)
+        other_order = await place_order(db, user_id=8, bonus=0)
+        assert (await db.redeem_qr(issue_token(other_order, 7), 100))['status'] == "no_order"
+        assert (await db.redeem_qr(issue_token(order_id, 7), 101))['status'] == "no_order"
+        assert await fetchval(db, "SELECT count(*) FROM orders WHERE status = 'delivered'") == 0
+
+    run(database_url, scenario)
+
+
+def test_cancel_revokes_signed_and_stored_qr(database_url, monkeypatch):
+    monkeypatch.setenv("QR_SECRET", "test-secret")
+
+    async def scenario(db):
+        order_id = await place_order(db)
+        signed = issue_token(order_id, 7)
+        stored = await db.generate_qr(7, order_id)
+        assert (await db.transition_order(order_id, ORDER_CANCELLED, user_id=7))['status'] == "ok"
+        assert (await db.redeem_qr(signed, 100))['status'] == "invalid"
+        assert (await db.redeem_qr(stored, 100))['status'] == "invalid"
+
+    run(database_url, scenario)
+
+
+def test_client_cannot_cancel_other_clients_order(database_url):
+    async def scenario(db):
+        order_id = await place_order(db)
+        await db.add_user(8, "iin", "address", "phone", "A")
+        assert (await db.transition_order(order_id, ORDER_CANCELLED, user_id=8))['status'] == "not_found"
+        assert (await db.transition_order(order_id, ORDER_ACCEPTED, courier_id=101))['status'] == "not_found"
+        assert await fetchval(db, "SELECT status FROM orders WHERE id = $1", order_id) == "assigned"
+
+    run(database_url, scenario)
+
+
+def test_concurrent_cancels_apply_once(database_url):
+    async def scenario(db):
+        order_id = await place_order(db)
+        results = await asyncio.gather(
+            *(db.transition_order(order_id, ORDER_CANCELLED, user_id=7) for _ in range(CONCURRENT_SCANS // 2)),
+            *(db.transition_order(order_id, ORDER_CANCELLED, courier_id=100) for _ in range(CONCURRENT_SCANS // 2)),
+        )
+        statuses = [r['status'] for r in results]
+        assert statuses.count("ok") == 1 and statuses.count("invalid") == CONCURRENT_SCANS - 1
+        assert await fetchval(db, "SELECT count(*) FROM qr_revocations WHERE order_id = $1", order_id) == 1
+
+    run(database_url, scenario)
+
+
+def test_bulk_import_keeps_last_duplicate(database_url):
+    async def scenario(db):
+        await db.bulk_upsert_clients([
+            (7, "iin", "first", "phone", "A"), (8, "iin", "other", "phone", "B"), (7, "iin", "last", "phone", "C"),
+        ])
+        await db.bulk_upsert_residents([(7, 1, 0, 0), (7, 2, 1, 0)])
+        await db.bulk_upsert_geocodes([("Абая 1", 43.0, 76.0), ("абая, 1", 43.5, 76.5)])
+        assert await fetchval(db, "SELECT address FROM users WHERE user_id = 7") == "last"
+        assert await fetchval(db, "SELECT balance FROM bonuses WHERE user_id = 7") == 7.5
+        assert await fetchval(db, "SELECT lat FROM geocodes") == 43.5
+
+    run(database_url, scenario)
@@ -0,0 +1,122 @@
+import asyncio
+import base64
+
+import pytest
+
+from fakedb import InMemoryDatabase
+from orders import ORDER_CANCELLED
+from qr_tokens import TOKEN_PREFIX, QRTokenError, check_secret, is_signed_token, issue_token, verify_token
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setenv("QR_SECRET", "test-secret")
+
+
+def test_round_trip():
+    code = issue_token(42, 7, ttl=60)
+    assert is_signed_token(code)
+    order_id, user_id, expires_at = verify_token(code)
+    assert (order_id, user_id) == (42, 7)
+    assert verify_token(code, now=expires_at) == (42, 7, expires_at)
+
+
+def test_other_secret_is_rejected(monkeypatch):
+    code = issue_token(42, 7)
+    monkeypatch.setenv("QR_SECRET", "other-secret")
+    with pytest.raises(QRTokenError) as e:
+        verify_token(code)
+    assert e.value.reason == "invalid"
+
+
+@pytest.mark.parametrize("code", ["", "WQ1.", "WQ1.!!!", "WQ1.AAAA", "0f8fad5b-d9cb-469f-a165-70867728950e"])
+def test_malformed_tokens_are_invalid(code):
+    with pytest.raises(QRTokenError) as e:
+        verify_token(code)
+    assert e.value.reason == "invalid"
+
+
+def decode(code):
+    body = code[len(TOKEN_PREFIX):]
+    return base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+
+
+def encode(raw):
+    return TOKEN_PREFIX + base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_tampered_signature_is_invalid():
+    raw = bytearray(decode(issue_token(42, 7)))
+    raw[-1] ^= 1
+    with pytest.raises(QRTokenError) as e:
+        verify_token(encode(bytes(raw)))
+    assert e.value.reason == "invalid"
+
+
+def test_payload_of_other_order_is_invalid():
+    # Номер заказа из другого токена с подписью исходного
+    raw, other = decode(issue_token(42, 7)), decode(issue_token(43, 7))
+    with pytest.raises(QRTokenError) as e:
+        verify_token(encode(other[:8] + raw[8:]))
+    assert e.value.reason == "invalid"
+
+
+def test_expired_token():
+    code = issue_token(42, 7, ttl=60)
+    _, _, expires_at = verify_token(code)
+    with pytest.raises(QRTokenError) as e:
+        verify_token(code, now=expires_at + 1)
+    assert e.value.reason == "expired"
+
+
+def test_water_prefix_is_not_a_token():
+    # Префикс старых QR снимает redeem_qr, а не verify_token
+    code = issue_token(42, 7)
+    with pytest.raises(QRTokenError) as e:
+        verify_token("WATER:" + code)
+    assert e.value.reason == "invalid"
+
+
+async def place_order(db, user_id=7, courier_id=100):
+    await db.add_user(user_id, "iin", "address", "phone", "A")
+    await db.create_couriers("Курьер", "iin", "phone", "address", "c@example.com", courier_id, "A")
+    return await db.create_order(user_id, courier_id, "вода")
+
+
+def test_redeem_wrong_order_and_prefix():
+    async def scenario():
+        db = InMemoryDatabase()
+        order_id = await place_order(db)
+        other_order = await db.create_order(8, 100, "вода")
+        # Токен клиента 7 на чужой заказ не гасит ни тот, ни другой заказ
+        wrong = await db.redeem_qr(issue_token(other_order, 7), 100)
+        assert wrong['status'] == "no_order"
+        # Курьер чужого заказа
+        assert (await db.redeem_qr(issue_token(order_id, 7), 101))['status'] == "no_order"
+        done = await db.redeem_qr("WATER:" + issue_token(order_id, 7), 100)
+        assert done['status'] == "done" and done['order_id'] == order_id
+        assert (await db.redeem_qr(issue_token(order_id, 7), 100))['status'] == "no_order"
+
+    asyncio.run(scenario())
+
+
+def test_cancel_revokes_token():
+    async def scenario():
+        db = InMemoryDatabase()
+        order_id = await place_order(db)
+        code = issue_token(order_id, 7)
+        result = await db.transition_order(order_id, ORDER_CANCELLED, user_id=7)
+        assert result['status'] == "ok"
+        assert order_id in db.qr_revocations
+        assert (await db.redeem_qr(code, 100))['status'] == "invalid"
+
+    asyncio.run(scenario())
+
+
+def test_missing_secret_fails_closed(monkeypatch):
+    monkeypatch.delenv("QR_SECRET")
+    monkeypatch.delenv("BOT_TOKEN", raising=False)
+    with pytest.raises(ValueError):
+        check_secret()
+    with pytest.raises(ValueError):
+        issue_token(42, 7)
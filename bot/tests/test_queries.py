@@ -0,0 +1,20 @@
+import re
+
+import geo
+import orders
+from repo import queries
+from repo.migrate import HOT_QUERIES
+
+
+def test_every_hot_query_is_plan_checked():
+    # Фрагменты, импортированные из orders и geo, — не запросы
+    fragments = {orders.OPEN_STATUSES_SQL, orders.DELIVERABLE_STATUSES_SQL, geo.ADDRESS_KEY_SQL}
+    constants = {sql for name, sql in vars(queries).items() if name.endswith("_SQL") and isinstance(sql, str) and sql not in fragments}
+    constants |= set(queries.COURIER_ORDERS_SQL.values())
+    assert constants <= {sql for _, sql, _ in HOT_QUERIES}
+
+
+def test_plan_check_params_match_placeholders():
+    for name, sql, params in HOT_QUERIES:
+        placeholders = {int(n) for n in re.findall(r"\$(\d+)", sql)}
+        assert placeholders == set(range(1, len(params) + 1)), name
@@ -0,0 +1,72 @@
+import asyncio
+import itertools
+import math
+import os
+import subprocess
+import sys
+
+from fakedb import InMemoryDatabase
+from geo import address_key, haversine_km
+from routes import plan_route
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_address_key_ignores_case_and_separators():
+    assert address_key("  ул. Абая,  10 ") == address_key("УЛ АБАЯ 10")
+
+
+def test_haversine_one_degree_of_latitude():
+    assert math.isclose(haversine_km(0, 0, 1, 0), 111.19, rel_tol=1e-3)
+    assert haversine_km(43.2, 76.9, 43.2, 76.9) == 0
+
+
+def path_km(start, points):
+    total, prev = 0.0, start
+    for point in points:
+        total += haversine_km(*prev, *point)
+        prev = point
+    return total
+
+
+def test_plan_route_is_optimal_on_small_inputs():
+    stops = [{'id': i, 'lat': lat, 'lon': lon} for i, (lat, lon) in enumerate(
+        [(43.20, 76.90), (43.30, 76.95), (43.22, 76.91), (43.28, 76.80), (43.25, 76.99)])]
+    start = (43.24, 76.85)
+    plan = plan_route(stops, start=start)
+    best = min(path_km(start, [(s['lat'], s['lon']) for s in perm]) for perm in itertools.permutations(stops))
+    assert math.isclose(plan['total_km'], best, rel_tol=1e-9)
+    assert sorted(s['id'] for s in plan['stops']) == list(range(5))
+    assert math.isclose(plan['total_km'], sum(s['leg_km'] for s in plan['stops']))
+
+
+def test_plan_route_keeps_unlocated_stops_apart():
+    stops = [{'id': 1, 'lat': None, 'lon': None}, {'id': 2, 'lat': 43.2, 'lon': 76.9}]
+    plan = plan_route(stops)
+    assert [s['id'] for s in plan['stops']] == [2]
+    assert plan['stops'][0]['leg_km'] == 0.0
+    assert [s['id'] for s in plan['unlocated']] == [1]
+    assert plan_route([]) == {'stops': [], 'total_km': 0.0, 'unlocated': []}
+
+
+def test_import_does_not_load_numpy():
+    # Диспетчер, запросы и маршруты подключаются при старте бота; numpy нужен только plan_route
+    code = "import sys, dispatcher, fakedb, routes; from repo import queries; print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BOT_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_route_uses_stored_coordinates_before_geocodes():
+    async def scenario():
+        db = InMemoryDatabase()
+        db.geocodes[address_key("Абая 1")] = (43.0, 76.0)
+        await db.add_user(7, "iin", "Абая 1", "phone", "A")
+        await db.create_couriers("Курьер", "iin", "phone", "Нет в справочнике", "c@example.com", 100, "A")
+        await db.create_order(7, 100, "вода")
+        await db.set_location(7, 43.5, 76.5)
+        await db.set_location(100, 43.1, 76.1)
+        return await db.get_route_stops(100)
+
+    stops, start = asyncio.run(scenario())
+    assert (stops[0]['lat'], stops[0]['lon']) == (43.5, 76.5)
+    assert start == (43.1, 76.1)
@@ -0,0 +1,163 @@
+import asyncio
+
+from telegram.error import RetryAfter
+
+from sender import PRIORITY_BULK, PRIORITY_CLIENT, MessageSender, ThrottledRequest, TokenBucket
+
+
+class FakeBot:
+    def __init__(self, fail_first=0, retry_after=0.05):
+        self.sent = []
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise RetryAfter(self.retry_after)
+        self.sent.append((chat_id, text))
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.take(0.0) == 0
+    assert bucket.take(0.0) == 0
+    assert bucket.take(0.0) == 0.5
+    assert bucket.take(0.5) == 0
+
+
+def test_priority_order():
+    async def scenario():
+        bot = FakeBot()
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=1)
+        sender.send(1, "bulk", priority=PRIORITY_BULK)
+        sender.send(2, "client", priority=PRIORITY_CLIENT)
+        sender.start(bot)
+        await sender.stop()
+        return bot.sent
+
+    assert asyncio.run(scenario()) == [(2, "client"), (1, "bulk")]
+
+
+def test_coalesce_pending_messages():
+    async def scenario():
+        bot = FakeBot()
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=1)
+        sender.send(1, "first", coalesce=True)
+        sender.send(1, "second", coalesce=True)
+        sender.start(bot)
+        await sender.stop()
+        return bot.sent, sender.stats
+
+    sent, stats = asyncio.run(scenario())
+    assert sent == [(1, "first\n\nsecond")]
+    assert stats['coalesced'] == 1
+
+
+def test_retry_after_is_delivered_once():
+    async def scenario():
+        bot = FakeBot(fail_first=1)
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=2)
+        results = []
+        sender.send(1, "hello", on_result=results.append)
+        sender.start(bot)
+        await asyncio.sleep(0.2)
+        await sender.stop()
+        return bot.sent, results, sender.stats
+
+    sent, results, stats = asyncio.run(scenario())
+    assert sent == [(1, "hello")]
+    assert results == [True]
+    assert stats['retried'] == 1
+
+
+def test_stop_waits_for_messages_delayed_by_retry_after():
+    async def scenario():
+        bot = FakeBot(fail_first=1, retry_after=0.2)
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=1)
+        sender.send(1, "hello")
+        sender.start(bot)
+        await asyncio.sleep(0.05)
+        await sender.stop(timeout=2)
+        return bot.sent
+
+    assert asyncio.run(scenario()) == [(1, "hello")]
+
+
+def test_pause_does_not_spend_global_tokens():
+    async def scenario():
+        bot = FakeBot(fail_first=1, retry_after=0.2)
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=4)
+        takes = []
+        take = sender._global.take
+        sender._global.take = lambda now: takes.append(now) or take(now)
+        for chat_id in range(1, 9):
+            sender.send(chat_id, "hello")
+        sender.start(bot)
+        await asyncio.sleep(0.05)
+        await sender.stop(timeout=2)
+        return bot.sent, takes
+
+    sent, takes = asyncio.run(scenario())
+    assert len(sent) == 8
+    # Один токен на каждую попытку отправки: 8 сообщений и повтор после 429
+    assert len(takes) == 9
+
+
+class FakeTransport:
+    def __init__(self, code=200, payload=b'{"ok": true, "result": true}'):
+        self.calls = []
+        self.code = code
+        self.payload = payload
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        self.calls.append(url.rsplit("/", 1)[-1])
+        return self.code, self.payload
+
+
+def test_direct_replies_share_global_limit():
+    async def scenario():
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=1)
+        takes = []
+        take = sender._global.take
+        sender._global.take = lambda now: takes.append(now) or take(now)
+        request = ThrottledRequest(FakeTransport(), sender)
+        await request.do_request("https://api/bot1:a/sendMessage", "POST")
+        await request.do_request("https://api/bot1:a/editMessageText", "POST")
+        await request.do_request("https://api/bot1:a/answerCallbackQuery", "POST")
+        return takes, sender.stats
+
+    takes, stats = asyncio.run(scenario())
+    assert len(takes) == 2 and stats['direct'] == 2
+
+
+def test_direct_reply_429_pauses_sender():
+    async def scenario():
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=1)
+        transport = FakeTransport(429, b'{"ok": false, "parameters": {"retry_after": 5}}')
+        await ThrottledRequest(transport, sender).do_request("https://api/bot1:a/sendMessage", "POST")
+        return sender._paused_until - asyncio.get_running_loop().time()
+
+    assert 4 < asyncio.run(scenario()) <= 5
+
+
+def test_queued_messages_take_one_token_through_throttled_request():
+    async def scenario():
+        sender = MessageSender(global_rate=1000, per_chat_rate=1000, workers=1)
+        request = ThrottledRequest(FakeTransport(), sender)
+
+        class Bot:
+            async def send_message(self, chat_id, text, **kwargs):
+                await request.do_request("https://api/bot1:a/sendMessage", "POST")
+
+        sender.send(1, "hello")
+        sender.start(Bot())
+        await sender.stop()
+        return sender.stats
+
+    stats = asyncio.run(scenario())
+    assert stats['sent'] == 1 and stats['direct'] == 0
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from telegram import Bot
+
+import webhook
+from webhook import FORWARDED_HEADER, WEBHOOK_PATH, create_webhook_app
+
+RealAsyncClient = httpx.AsyncClient
+
+SECRET = "secret"
+
+
+@pytest.fixture
+def client():
+    # Без lifespan: проверяется только разбор тела запроса
+    application = SimpleNamespace(bot=Bot("1:a"), update_queue=asyncio.Queue())
+    return TestClient(create_webhook_app(application, "https://example.com", SECRET)), application.update_queue
+
+
+def post(client, content):
+    return client.post(WEBHOOK_PATH, content=content, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]", b"null", b'{"message": {"chat": 1}}'])
+def test_malformed_update_is_rejected_with_400(client, body):
+    client, queue = client
+    assert post(client, body).status_code == 400
+    assert queue.empty()
+
+
+def test_valid_update_is_queued(client):
+    client, queue = client
+    assert post(client, b'{"update_id": 1}').status_code == 200
+    assert queue.get_nowait().update_id == 1
+
+
+def test_wrong_secret_is_forbidden(client):
+    client, _ = client
+    assert client.post(WEBHOOK_PATH, content=b'{"update_id": 1}').status_code == 403
+
+
+def routed_client(monkeypatch, replica_index, forwarded):
+    def handler(request):
+        forwarded.append((str(request.url), request.headers.get(FORWARDED_HEADER), request.content))
+        return httpx.Response(200)
+
+    application = SimpleNamespace(bot=Bot("1:a"), update_queue=asyncio.Queue())
+    # Подменяется только клиент пересылки, создаваемый в create_webhook_app
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(webhook.httpx, "AsyncClient", lambda **kwargs: RealAsyncClient(transport=transport, **kwargs))
+    api = create_webhook_app(
+        application, "https://example.com", SECRET,
+        replicas=["http://bot-0:8000", "http://bot-1:8000"], replica_index=replica_index,
+    )
+    return TestClient(api), application.update_queue
+
+
+def chat_update(chat_id):
+    return json.dumps({
+        'update_id': 1,
+        'message': {'message_id': 1, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'}, 'text': "вода"},
+    }).encode()
+
+
+def test_foreign_chat_is_forwarded_to_its_replica(monkeypatch):
+    forwarded = []
+    client, queue = routed_client(monkeypatch, 0, forwarded)
+    assert post(client, chat_update(7)).status_code == 200
+    assert queue.empty()
+    assert forwarded == [("http://bot-1:8000" + WEBHOOK_PATH, "1", chat_update(7))]
+    # Свой чат обрабатывается на месте
+    assert post(client, chat_update(8)).status_code == 200
+    assert queue.get_nowait().effective_chat.id == 8
+    assert len(forwarded) == 1
+
+
+def test_forwarded_update_is_not_forwarded_again(monkeypatch):
+    forwarded = []
+    client, queue = routed_client(monkeypatch, 0, forwarded)
+    response = client.post(WEBHOOK_PATH, content=chat_update(7), headers={
+        "X-Telegram-Bot-Api-Secret-Token": SECRET, FORWARDED_HEADER: "1",
+    })
+    assert response.status_code == 200
+    assert queue.get_nowait().effective_chat.id == 7
+    assert forwarded == []
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def chat_key(update):
+    """Ключ чата обновления (чат, иначе пользователь) или None — для очередей и выбора реплики"""
+    if isinstance(update, Update):
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка обновлений: разные чаты обрабатываются одновременно
+    (не больше max_concurrent_updates), обновления одного чата — строго по очереди,
+    чтобы шаги ConversationHandler не перемешивались.
+    """
+
+    def __init__(self, max_concurrent_updates=None):
+        super().__init__(max_concurrent_updates or int(os.getenv("UPDATE_CONCURRENCY", "64")))
+        self._chat_locks = {}  # ключ чата -> [asyncio.Lock, число ожидающих]
+
+    async def process_update(self, update, coroutine):
+        # Очередь чата занимается до глобального лимита: обновления, ждущие своей очереди,
+        # не занимают слоты других чатов. asyncio.Lock отдаёт блокировку в порядке ожидания,
+        # а задачи на обработку создаются в порядке поступления обновлений.
+        key = chat_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
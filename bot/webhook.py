@@ -0,0 +1,135 @@
+import hmac
+import json
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from telegram import Update
+
+from metrics import registry
+from updates import chat_key
+
+WEBHOOK_PATH = "/telegram/webhook"
+# Отметка пересланного другой репликой обновления: его обрабатывают здесь, не пересылая дальше
+FORWARDED_HEADER = "X-Bot-Forwarded"
+
+
+def replica_for(update, replicas):
+    """Индекс реплики, которая обрабатывает чат обновления: все обновления чата — на одной реплике"""
+    key = chat_key(update)
+    return 0 if key is None else key % len(replicas)
+
+
+def create_webhook_app(application, webhook_url, secret_token, replicas=None, replica_index=0):
+    """
+    FastAPI-приложение, принимающее обновления Telegram через webhook.
+    Запросы без верного X-Telegram-Bot-Api-Secret-Token отклоняются;
+    обновления кладутся в application.update_queue и обрабатываются как при polling.
+
+    replicas — внутренние адреса всех реплик в одном и том же порядке на каждой из них.
+    Обновление чужого чата пересылается реплике-владельцу: состояние диалогов
+    (PostgresPersistence) и очередь чата живут в памяти одной реплики.
+    """
+    state = {"ready": False}
+    replicas = replicas or []
+    forward_client = httpx.AsyncClient(timeout=10)
+
+    @asynccontextmanager
+    async def lifespan(_):
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=webhook_url.rstrip("/") + WEBHOOK_PATH,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        await application.start()
+        state["ready"] = True
+        print("Бот запущен (webhook)...")
+        try:
+            yield
+        finally:
+            state["ready"] = False
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+            await forward_client.aclose()
+
+    api = FastAPI(lifespan=lifespan)
+
+    @api.post(WEBHOOK_PATH)
+    async def telegram_webhook(request: Request):
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(received, secret_token):
+            return Response(status_code=403)
+        # Испорченное тело — 400, а не 500: на 5xx Telegram повторяет то же обновление снова и снова
+        try:
+            body = await request.body()
+            data = json.loads(body)
+            if not isinstance(data, dict):
+                raise ValueError("тело обновления — не JSON-объект")
+            update = Update.de_json(data, application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"⚠️ Отклонено обновление webhook: {e}")
+            return Response(status_code=400)
+        owner = replica_for(update, replicas) if replicas else replica_index
+        if owner != replica_index and not request.headers.get(FORWARDED_HEADER):
+            return await forward(replicas[owner], body)
+        await application.update_queue.put(update)
+        return Response(status_code=200)
+
+    async def forward(replica_url, body):
+        # Ошибка пересылки — 502: Telegram повторит обновление позже
+        try:
+            response = await forward_client.post(
+                replica_url.rstrip("/") + WEBHOOK_PATH,
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Telegram-Bot-Api-Secret-Token": secret_token,
+                    FORWARDED_HEADER: "1",
+                },
+            )
+        except httpx.HTTPError as e:
+            print(f"❌ Не удалось переслать обновление реплике {replica_url}: {e}")
+            return Response(status_code=502)
+        return Response(status_code=response.status_code)
+
+    @api.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @api.get("/ready")
+    async def ready():
+        if not state["ready"]:
+            return Response(status_code=503)
+        return {"status": "ready"}
+
+    @api.get("/metrics")
+    async def metrics():
+        return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
+
+    return api
+
+
+def run_webhook(application):
+    webhook_url = os.environ["WEBHOOK_URL"]
+    secret_token = os.environ["WEBHOOK_SECRET"]
+    # Несколько реплик: WEBHOOK_REPLICAS="http://bot-0:8000,http://bot-1:8000", WEBHOOK_REPLICA_INDEX — своя позиция.
+    # Список меняется только перезапуском всех реплик: иначе чат может перейти к реплике с устаревшим кэшем
+    replicas = [url.strip() for url in os.getenv("WEBHOOK_REPLICAS", "").split(",") if url.strip()]
+    api = create_webhook_app(
+        application, webhook_url, secret_token,
+        replicas=replicas, replica_index=int(os.getenv("WEBHOOK_REPLICA_INDEX", "0")),
+    )
+    uvicorn.run(
+        api,
+        host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        port=int(os.getenv("WEBHOOK_PORT", "8000")),
+    )